@@ -1,58 +1,201 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g
 from datetime import datetime
 import markdown2
+import asyncio
 import json
 import os
+import atexit
+import time
 from services.channel_service import (
     load_channels,
     save_channels,
     fetch_slack_conversation,
-    summarize_conversation,
+    summarize_conversation_detailed,
+    stream_summary,
     fetch_outlook_emails,
     check_outlook_auth_status,
     authenticate_outlook,
-    send_outlook_email
+    send_outlook_email,
+    shutdown_services,
+    get_summary_cache_stats,
+    slack_mcp,
+    outlook_pool,
+    user_directory
 )
-import asyncio
+from services.background_loop import background_loop
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from werkzeug.exceptions import GatewayTimeout
+from services import tracing
+from services.metrics import metrics, record_request, stream_first_token_seconds
+from services.jobs import job_queue, SUCCEEDED
+from services.json_file_cache import JsonFileCache
+from services.corpus import get_corpus_rag, get_corpus_search, loaded_corpus_rag, reindex_corpus
+from part2.generate_actions_by_client import refresh_action_items
+
+# Async views still running after this many seconds are cancelled
+ASYNC_VIEW_TIMEOUT = float(os.environ.get("ASYNC_VIEW_TIMEOUT", "600"))
+ASYNC_VIEW_TIMEOUT_ERROR = f"Request did not finish within {ASYNC_VIEW_TIMEOUT:g}s"
+# Recent emails summarized for an Outlook channel
+OUTLOOK_SUMMARY_EMAILS = int(os.environ.get("OUTLOOK_SUMMARY_EMAILS", "20"))
+
+class NosyWorkerFlask(Flask):
+    """Flask app whose `async def` views run on the shared background loop.
+
+    Flask's default starts a new event loop for every async view. Running them
+    on `background_loop` instead lets concurrent requests overlap on one loop
+    with the warm MCP sessions and LLM connection pool, without a hop per call.
+    Views must therefore not block: disk, sqlite and CPU-heavy work goes
+    through `asyncio.to_thread`.
 
-app = Flask(__name__)
+    A view still running after ASYNC_VIEW_TIMEOUT seconds is cancelled, along
+    with the LLM calls and other awaits it has in flight, and answers 504. A
+    client that disconnects is only noticed by the WSGI server once the
+    response is written, so until then its view runs on (up to the timeout).
+    """
+
+    def async_to_sync(self, func):
+        def run(*args, **kwargs):
+            # The request context travels with the coroutine (contextvars are copied)
+            try:
+                return background_loop.run(func(*args, **kwargs), ASYNC_VIEW_TIMEOUT)
+            except FutureTimeoutError:
+                raise GatewayTimeout(ASYNC_VIEW_TIMEOUT_ERROR)
+        return run
+
+app = NosyWorkerFlask(__name__)
+
+@app.errorhandler(GatewayTimeout)
+def gateway_timeout(e):
+    return jsonify({
+        "success": False,
+        "error": e.description
+    }), 504
+
+# Close the pooled Outlook MCP sessions and LLM connections on exit
+atexit.register(shutdown_services)
+atexit.register(job_queue.shutdown)
 
 # Load channels from JSON file
 channels = load_channels()
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The URL rule, not the path, keeps the label set bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        record_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@metrics.collector
+def service_metrics():
+    """Gauges read from the caches, MCP clients and job queue at scrape time."""
+    summary = get_summary_cache_stats()
+    action_items = [action_items_cache.stats(), client_action_items_cache.stats()]
+    yield ("nosyworker_cache_lookups_total", "counter", "Cache lookups by cache and result.", [
+        ({"cache": "summary", "result": "hit"}, summary["hits"]),
+        ({"cache": "summary", "result": "miss"}, summary["misses"]),
+        ({"cache": "action_items", "result": "hit"}, sum(stats["hits"] for stats in action_items)),
+        ({"cache": "action_items", "result": "miss"}, sum(stats["loads"] for stats in action_items)),
+    ])
+    yield ("nosyworker_cache_hit_ratio", "gauge", "Hits over lookups since start.", [
+        ({"cache": "summary"}, summary["hit_rate"]),
+    ])
+    yield ("nosyworker_cache_entries", "gauge", "Entries held in memory.", [
+        ({"cache": "summary"}, summary["entries"]),
+    ])
+    rag = loaded_corpus_rag()
+    if rag is not None:
+        # Only reported once the RAG service has been loaded by a request
+        pipeline = rag.embedding_pipeline
+        yield ("nosyworker_embedding_lookups_total", "counter", "Embedding cache lookups by result.", [
+            ({"result": "hit"}, pipeline.cache_hits),
+            ({"result": "miss"}, pipeline.encoded),
+        ])
+    depth = job_queue.depth()
+    yield ("nosyworker_jobs", "gauge", "Background jobs by state.", [
+        ({"state": "queued"}, depth["queued"]),
+        ({"state": "running"}, depth["running"]),
+    ])
+    slack = slack_mcp.stats()
+    outlook = outlook_pool.stats()
+    yield ("nosyworker_mcp_in_flight", "gauge", "MCP tool calls in flight.", [
+        ({"server": "slack"}, slack["in_flight"]),
+        ({"server": "outlook"}, outlook["in_flight"]),
+    ])
+    yield ("nosyworker_mcp_sessions", "gauge", "Live MCP sessions.", [
+        ({"server": "slack"}, 1 if slack["connected"] else 0),
+        ({"server": "outlook"}, outlook["alive"]),
+    ])
+    yield ("nosyworker_mcp_reconnects_total", "counter", "MCP sessions replaced after a failure.", [
+        ({"server": "slack"}, max(0, slack["connects"] - 1)),
+        ({"server": "outlook"}, outlook["restarts"]),
+    ])
+    users = user_directory.stats()
+    yield ("nosyworker_slack_users", "gauge", "Users in the cached Slack user directory.", [({}, users["users"])])
+    yield ("nosyworker_slack_user_directory_age_seconds", "gauge", "Age of the cached Slack user directory.", [
+        ({}, users["age_seconds"]),
+    ])
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def dashboard():
     return render_template('dashboard.html', 
                          channels=channels,
                          enabled_channels=channels)
 
-@app.route('/api/action-items', methods=['GET'])
-def get_action_items():
+# Parsed action item files with their response bodies; polls are served from memory
+ACTION_ITEMS_CHECK_INTERVAL = float(os.environ.get("ACTION_ITEMS_CHECK_INTERVAL", "2"))
+
+def jsonify_body(obj):
+    """The exact bytes jsonify() would send for `obj`."""
+    return app.json.response(obj).get_data()
+
+action_items_cache = JsonFileCache(
+    os.path.join('part2', 'all_actions.json'),
+    lambda data: {"success": True, "action_items": data},
+    check_interval=ACTION_ITEMS_CHECK_INTERVAL,
+    serialize=jsonify_body,
+)
+client_action_items_cache = JsonFileCache(
+    os.path.join('part2', 'actions_by_client.json'),
+    lambda data: {"success": True, "action_items": data},
+    check_interval=ACTION_ITEMS_CHECK_INTERVAL,
+    serialize=jsonify_body,
+)
+
+@job_queue.add_listener
+def invalidate_action_items(job):
+    if job.kind == 'refresh-action-items' and job.status == SUCCEEDED:
+        action_items_cache.invalidate()
+        client_action_items_cache.invalidate()
+
+def cached_json_response(cache, missing_error):
+    """Serve a cached JSON file, answering If-None-Match with 304 when it has not changed."""
     try:
-        # Look for the action items JSON file in part2 directory
-        action_items_path = os.path.join('part2', 'all_actions.json')
-        if os.path.exists(action_items_path):
-            with open(action_items_path, 'r') as f:
-                action_items = json.load(f)
-            return jsonify({"success": True, "action_items": action_items})
-        else:
-            return jsonify({"success": False, "error": "No action items found"})
+        entry = cache.get()
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
+    if entry is None:
+        return jsonify({"success": False, "error": missing_error})
+    response = Response(entry.body, mimetype='application/json', headers={'Cache-Control': 'no-cache'})
+    response.set_etag(entry.etag)
+    return response.make_conditional(request)
+
+@app.route('/api/action-items', methods=['GET'])
+def get_action_items():
+    return cached_json_response(action_items_cache, "No action items found")
 
 @app.route('/api/action-items-by-client', methods=['GET'])
 def get_action_items_by_client():
-    try:
-        # Look for the client-organized action items JSON file in part2 directory
-        action_items_path = os.path.join('part2', 'actions_by_client.json')
-        if os.path.exists(action_items_path):
-            with open(action_items_path, 'r') as f:
-                action_items = json.load(f)
-            return jsonify({"success": True, "action_items": action_items})
-        else:
-            return jsonify({"success": False, "error": "No client-organized action items found"})
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)})
+    return cached_json_response(client_action_items_cache, "No client-organized action items found")
 
 @app.route('/api/channels/<channel_id>/profile', methods=['GET'])
 def get_channel_profile(channel_id):
@@ -79,16 +222,63 @@ def update_channel_profile(channel_id):
             return jsonify({"success": True, "profile": channel["profile"]})
     return jsonify({"success": False, "error": "Channel not found"}), 404
 
+def find_channel(channel_id):
+    for ch in channels:
+        if ch["id"] == channel_id:
+            return ch
+    return None
+
+async def fetch_channel_conversation(channel, start_time, end_time):
+    """Fetch the conversation to summarize for a channel.
+
+    Returns (conversation, None) on success or (None, (error_payload, status)).
+    """
+    if channel["type"] == "slack":
+        if "slack_channel_id" not in channel:
+            return None, ({
+                "success": False,
+                "error": "Channel not configured for Slack"
+            }, 404)
+        # Convert ISO timestamps to Unix timestamps
+        start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+        end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+        start_timestamp = int(start_dt.timestamp())
+        end_timestamp = int(end_dt.timestamp())
+        # Fetch conversation from Slack
+        with tracing.span("slack.fetch_conversation", channel=channel["slack_channel_id"]):
+            conversation = await fetch_slack_conversation(channel["slack_channel_id"], str(start_timestamp), str(end_timestamp))
+        return conversation, None
+    elif channel["type"] == "outlook":
+        if "outlook_folder" not in channel or not channel["outlook_folder"]:
+            return None, ({
+                "success": False,
+                "error": "Channel not configured for Outlook"
+            }, 404)
+        # Fetch the most recent emails; their bodies are read concurrently
+        with tracing.span("outlook.fetch_emails", folder=channel["outlook_folder"]):
+            emails = await fetch_outlook_emails(channel["outlook_folder"], OUTLOOK_SUMMARY_EMAILS)
+        # Format each email as one conversation entry for summarization
+        conversation = [
+            f"From: {email['sender']} <{email['address']}>, Subject: {email['subject']}, Date: {email['receivedDateTime']}\n{email['body']}"
+            for email in emails
+        ]
+        return conversation, None
+    return None, ({
+        "success": False,
+        "error": "Unsupported channel type"
+    }, 400)
+
+def response_timings(timings, root):
+    """Summary stage timings, plus the request's span breakdown in debug mode."""
+    if app.debug or tracing.TRACE_DEBUG:
+        return {**timings, "trace": tracing.timings(root)}
+    return timings
+
 @app.route('/api/channels/<channel_id>/summarize', methods=['POST'])
 async def summarize_channel(channel_id):
     try:
         # Find channel in config
-        channel = None
-        for ch in channels:
-            if ch["id"] == channel_id:
-                channel = ch
-                break
-        
+        channel = find_channel(channel_id)
         if not channel:
             return jsonify({
                 "success": False,
@@ -96,49 +286,24 @@ async def summarize_channel(channel_id):
             }), 404
 
         data = request.json
-        start_time = data.get('startTime')
-        end_time = data.get('endTime')
-
-        if channel["type"] == "slack":
-            if "slack_channel_id" not in channel:
-                return jsonify({
-                    "success": False,
-                    "error": "Channel not configured for Slack"
-                }), 404
-            # Convert ISO timestamps to Unix timestamps
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            start_timestamp = int(start_dt.timestamp())
-            end_timestamp = int(end_dt.timestamp())
-            # Fetch conversation from Slack
-            conversation = await fetch_slack_conversation(channel["slack_channel_id"], str(start_timestamp), str(end_timestamp))
-            # Generate summary
-            markdown_summary = await summarize_conversation(str(conversation))
-        elif channel["type"] == "outlook":
-            if "outlook_folder" not in channel or not channel["outlook_folder"]:
-                return jsonify({
-                    "success": False,
-                    "error": "Channel not configured for Outlook"
-                }), 404
-            # Fetch recent emails (e.g., 20 most recent)
-            emails = await fetch_outlook_emails(channel["outlook_folder"], 1)
-            # Format emails as a conversation string for summarization
-            conversation = ""
-            for email in emails:
-                conversation += f"From: {email['sender']} <{email['address']}>, Subject: {email['subject']}, Date: {email['receivedDateTime']}\n{email['body']}\n---\n"
-            # Generate summary
-            markdown_summary = await summarize_conversation(conversation)
-        else:
-            return jsonify({
-                "success": False,
-                "error": "Unsupported channel type"
-            }), 400
-        # Convert markdown to HTML
-        html_summary = markdown2.markdown(markdown_summary)
+        with tracing.trace("summarize", channel=channel_id, channel_type=channel["type"]) as root:
+            conversation, error = await fetch_channel_conversation(channel, data.get('startTime'), data.get('endTime'))
+            if error:
+                return jsonify(error[0]), error[1]
+            # Generate summary (split on message boundaries if it is too large for one prompt)
+            result = await summarize_conversation_detailed(conversation)
+            markdown_summary = result["summary"]
+            # Convert markdown to HTML
+            with tracing.span("markdown"):
+                # CPU-bound; keep it off the shared event loop
+                html_summary = await asyncio.to_thread(markdown2.markdown, markdown_summary)
         return jsonify({
             "success": True,
             "summary": html_summary,
-            "markdown_summary": markdown_summary
+            "markdown_summary": markdown_summary,
+            "cached": result["cached"],
+            "chunks": result["chunks"],
+            "timings": response_timings(result["timings"], root)
         })
     except Exception as e:
         return jsonify({
@@ -146,18 +311,85 @@ async def summarize_channel(channel_id):
             "error": str(e)
         }), 500
 
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/channels/<channel_id>/summarize/stream', methods=['POST'])
+def summarize_channel_stream(channel_id):
+    """Streaming variant of summarize: sends tokens as Server-Sent Events, then a final `done` event."""
+    request_started = time.perf_counter()
+    channel = find_channel(channel_id)
+    if not channel:
+        return jsonify({"success": False, "error": "Channel not found"}), 404
+    data = request.json
+    # The trace outlives this view: it is finished by the response generator
+    root = tracing.start_trace("summarize_stream", channel=channel_id, channel_type=channel["type"])
+    try:
+        with tracing.activate(root):
+            conversation, error = background_loop.run(
+                fetch_channel_conversation(channel, data.get('startTime'), data.get('endTime')),
+                ASYNC_VIEW_TIMEOUT
+            )
+    except FutureTimeoutError:
+        root.error = ASYNC_VIEW_TIMEOUT_ERROR
+        tracing.finish_trace(root)
+        return jsonify({"success": False, "error": ASYNC_VIEW_TIMEOUT_ERROR}), 504
+    except Exception as e:
+        root.error = str(e)
+        tracing.finish_trace(root)
+        return jsonify({"success": False, "error": str(e)}), 500
+    if error:
+        tracing.finish_trace(root)
+        return jsonify(error[0]), error[1]
+
+    route = request.url_rule.rule
+
+    def generate():
+        first_token = True
+        try:
+            with tracing.activate(root):
+                for event in stream_summary(conversation, timeout=ASYNC_VIEW_TIMEOUT):
+                    if event["type"] == "token":
+                        if first_token:
+                            first_token = False
+                            stream_first_token_seconds.observe(time.perf_counter() - request_started, route)
+                        yield sse_event("token", {"text": event["text"]})
+                    else:
+                        markdown_summary = event["summary"]
+                        with tracing.span("markdown"):
+                            html_summary = markdown2.markdown(markdown_summary)
+                        yield sse_event("done", {
+                            "success": True,
+                            "summary": html_summary,
+                            "markdown_summary": markdown_summary,
+                            "cached": event["cached"],
+                            "chunks": event["chunks"],
+                            "timings": response_timings(event["timings"], root)
+                        })
+        except FutureTimeoutError:
+            root.error = ASYNC_VIEW_TIMEOUT_ERROR
+            yield sse_event("error", {"success": False, "error": ASYNC_VIEW_TIMEOUT_ERROR})
+        except Exception as e:
+            root.error = str(e)
+            yield sse_event("error", {"success": False, "error": str(e)})
+        finally:
+            tracing.finish_trace(root)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/outlook/auth-status', methods=['GET'])
-def outlook_auth_status():
+async def outlook_auth_status():
     try:
-        authenticated = asyncio.run(check_outlook_auth_status())
+        authenticated = await check_outlook_auth_status()
         return jsonify({"success": True, "authenticated": authenticated})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 @app.route('/api/outlook/authenticate', methods=['POST'])
-def outlook_authenticate():
+async def outlook_authenticate():
     try:
-        auth_link = asyncio.run(authenticate_outlook())
+        auth_link = await authenticate_outlook()
         return jsonify({"success": True, "auth_link": auth_link})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
@@ -176,7 +408,8 @@ async def send_action_email():
         
         # Call the send-email tool
         try:
-            result = await send_outlook_email(to_email, subject, message)
+            with tracing.trace("send_action_email"):
+                result = await send_outlook_email(to_email, subject, message)
         except Exception as e:
             print(e)
 
@@ -219,18 +452,104 @@ async def send_action_email():
         print(f"General Error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def run_action_refresh(job):
+    """Regenerate action items in-process, reporting per-file progress on the job."""
+    _, _, stats = refresh_action_items(
+        on_progress=lambda done, total: job.set_progress(done, total, f"Processed {done} of {total} summaries")
+    )
+    return stats
+
 @app.route('/api/refresh-action-items', methods=['POST'])
-def refresh_action_items():
-    """API endpoint to run the generate_actions_by_client.py script and refresh action items."""
+def refresh_action_items_route():
+    """Queue an action item refresh; returns a job ID to poll instead of waiting for the run."""
     try:
-        result = os.system('python3 part2/generate_actions_by_client.py')
-        if result == 0:
-            return jsonify({"success": True, "message": "Action items refreshed successfully."})
-        else:
-            return jsonify({"success": False, "error": f"Script exited with code {result}"}), 500
+        job, created = job_queue.submit('refresh-action-items', run_action_refresh)
+        return jsonify({
+            "success": True,
+            "job_id": job.id,
+            "status": job.status,
+            "deduplicated": not created
+        }), 202
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+@app.route('/api/ask', methods=['POST'])
+def ask():
+    """Answer a question over the indexed Slack messages, Outlook emails and saved summaries."""
+    try:
+        data = request.json
+        question = data.get('question')
+        if not question:
+            return jsonify({"success": False, "error": "Missing question"}), 400
+        result = get_corpus_rag().answer(question, k=int(data.get('k', 3)))
+        if result["answer"] is None:
+            return jsonify({"success": False, "error": "The corpus index is empty; run /api/ask/reindex first"}), 409
+        return jsonify({
+            "success": True,
+            "answer": result["answer"],
+            "sources": [
+                {"key": doc["key"], "score": doc["score"], "metadata": doc["metadata"]}
+                for doc in result["sources"]
+            ]
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def parse_time_param(value):
+    """Accept a unix timestamp or an ISO 8601 string; None when absent."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+@app.route('/api/search', methods=['GET'])
+def search_corpus():
+    """Keyword + vector search over the indexed corpus, with channel/sender/time filters."""
+    try:
+        query = request.args.get('q')
+        if not query:
+            return jsonify({"success": False, "error": "Missing q"}), 400
+        mode = request.args.get('mode', 'hybrid')
+        if mode not in ('hybrid', 'keyword', 'vector'):
+            return jsonify({"success": False, "error": f"Unknown mode: {mode}"}), 400
+        results = get_corpus_search().search(
+            query,
+            k=int(request.args.get('k', 10)),
+            mode=mode,
+            channel=request.args.get('channel'),
+            sender=request.args.get('sender'),
+            source=request.args.get('source'),
+            start=parse_time_param(request.args.get('start')),
+            end=parse_time_param(request.args.get('end')),
+        )
+        return jsonify({"success": True, "mode": mode, "results": results})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/ask/reindex', methods=['POST'])
+def reindex_ask_corpus():
+    """Queue a corpus refresh (fetch + embed new/changed documents); poll /api/jobs/<id>."""
+    job, created = job_queue.submit(
+        'reindex-corpus',
+        lambda job: reindex_corpus(channels, on_progress=job.set_progress)
+    )
+    return jsonify({"success": True, "job_id": job.id, "status": job.status, "deduplicated": not created}), 202
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"success": True, "summary_cache": get_summary_cache_stats()})
+
 @app.route('/api/save-summary', methods=['POST'])
 def save_summary():
     try:
@@ -249,4 +568,5 @@ def save_summary():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Development server; see asgi.py for production serving
     app.run(debug=True)
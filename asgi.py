@@ -0,0 +1,78 @@
+"""
+ASGI entry point for production serving.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 1
+
+Run exactly one worker process and scale with ASGI_THREADS instead. The job
+queue, its per-kind deduplication, job status lookups and the action item
+cache invalidation all live in the process, so a second worker would answer
+`GET /api/jobs/<id>` with 404 for jobs it did not start and would run its own
+refreshes against the same part2 files. At startup the worker takes an
+exclusive lock on ASGI_LOCK_PATH (default data/asgi.lock) and fails the
+lifespan startup if another worker already holds it.
+
+The app is served through a2wsgi's WSGI adapter: requests run on a pool of
+ASGI_THREADS threads (default 32) and their async views share the app's
+background event loop, so concurrent summarize requests overlap. On shutdown
+the lifespan handler closes the MCP sessions, the LLM connection pool and the
+job queue before the worker exits.
+"""
+import fcntl
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+from services.channel_service import shutdown_services
+from services.jobs import job_queue
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", "32"))
+ASGI_LOCK_PATH = os.environ.get("ASGI_LOCK_PATH", os.path.join("data", "asgi.lock"))
+
+flask_app = WSGIMiddleware(app, workers=ASGI_THREADS)
+# Held open for the life of the worker; the OS releases the lock when it exits
+_worker_lock = None
+
+
+def acquire_worker_lock() -> bool:
+    """Take the single-worker lock; False if another worker process holds it."""
+    global _worker_lock
+    os.makedirs(os.path.dirname(ASGI_LOCK_PATH) or ".", exist_ok=True)
+    lock_file = open(ASGI_LOCK_PATH, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    _worker_lock = lock_file
+    return True
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if not acquire_worker_lock():
+                await send({
+                    "type": "lifespan.startup.failed",
+                    "message": f"Another worker holds {ASGI_LOCK_PATH}; run uvicorn with --workers 1 "
+                               "and scale with ASGI_THREADS",
+                })
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Blocking is fine here: the worker has stopped accepting requests
+            try:
+                shutdown_services()
+                job_queue.shutdown()
+            except Exception as e:
+                print(f"[DEBUG] Error during shutdown: {e}")
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    else:
+        await flask_app(scope, receive, send)
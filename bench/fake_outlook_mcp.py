@@ -0,0 +1,66 @@
+"""
+Stand-in for the outlook-mcp stdio server.
+
+Implements the tools NosyWorker calls (list-emails, read-email, send-email,
+check-auth-status, authenticate) with the same plain-text responses, after a
+configurable delay. The MCP client starts stdio servers with a minimal
+environment, so settings are read from `fake_outlook.json` in the working
+directory ({"latency": seconds, "body_words": n}); point the app at it with
+
+    OUTLOOK_MCP_COMMAND=python OUTLOOK_MCP_SCRIPT=bench/fake_outlook_mcp.py
+"""
+import asyncio
+import json
+import os
+import random
+
+from mcp.server.fastmcp import FastMCP
+
+CONFIG = {"latency": 0.02, "body_words": 120}
+if os.path.exists("fake_outlook.json"):
+    with open("fake_outlook.json", "r") as f:
+        CONFIG.update(json.load(f))
+
+WORDS = "please review the attached proposal and confirm the renewal timeline before friday".split()
+
+mcp = FastMCP("fake-outlook")
+
+
+@mcp.tool(name="list-emails")
+async def list_emails(folder: str = "inbox", count: int = 10) -> str:
+    await asyncio.sleep(CONFIG["latency"])
+    return "\n".join(f"{i + 1}. Subject: Benchmark email {i}\nID: {folder}-{i}" for i in range(count))
+
+
+@mcp.tool(name="read-email")
+async def read_email(id: str) -> str:
+    await asyncio.sleep(CONFIG["latency"])
+    rng = random.Random(id)
+    body = " ".join(rng.choice(WORDS) for _ in range(CONFIG["body_words"]))
+    return (
+        f"From: Customer {id} (customer-{id}@example.com)\n"
+        f"To: bench@example.com\n"
+        f"Subject: Benchmark email {id}\n"
+        f"Date: Mon, 06 Oct 2025 09:00:00 +0000\n"
+        f"\n{body}"
+    )
+
+
+@mcp.tool(name="send-email")
+async def send_email(to: str, subject: str, body: str, importance: str = "normal", saveToSentItems: bool = True) -> str:
+    await asyncio.sleep(CONFIG["latency"])
+    return f"Email sent successfully!\n\nSubject: {subject}\nRecipients: {to}\nMessage Length: {len(body)} characters"
+
+
+@mcp.tool(name="check-auth-status")
+async def check_auth_status() -> str:
+    return "Authenticated and ready"
+
+
+@mcp.tool(name="authenticate")
+async def authenticate() -> str:
+    return "Already authenticated"
+
+
+if __name__ == "__main__":
+    mcp.run()
@@ -0,0 +1,212 @@
+"""
+Local stand-ins for the Slack Web API and the Together (OpenAI-compatible) API.
+
+Both are small aiohttp apps with configurable latency and payload size, so the
+real MCP server, Flask app and part2 pipeline can be benchmarked without network
+access or API keys. `bench/run.py` starts them in-process; they can also be run
+on their own:
+
+    python bench/fake_services.py --slack-port 8101 --llm-port 8102
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+
+from aiohttp import web
+
+WORDS = (
+    "deploy review customer ticket release blocked staging outage follow up invoice onboarding "
+    "migration dashboard latency fix rollback meeting demo contract renewal escalation docs"
+).split()
+
+
+@dataclass
+class SlackConfig:
+    latency: float = 0.05
+    messages_per_day: int = 200
+    text_words: int = 20
+    thread_every: int = 10
+    replies_per_thread: int = 3
+    users: int = 50
+    # Answer every Nth request with a 429 (0 disables)
+    rate_limit_every: int = 0
+    retry_after: float = 1.0
+
+
+@dataclass
+class LLMConfig:
+    latency: float = 0.2
+    tokens: int = 200
+    token_delay: float = 0.002
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def channel_messages(config: SlackConfig, channel: str, oldest: float, latest: float):
+    """Deterministic top-level messages for a channel, newest first."""
+    interval = 86400 / max(1, config.messages_per_day)
+    first = int(oldest // interval) + 1
+    last = int(latest // interval)
+    messages = []
+    for n in range(last, first - 1, -1):
+        ts = n * interval
+        rng = random.Random(f"{channel}:{n}")
+        message = {
+            "type": "message",
+            "ts": f"{ts:.6f}",
+            "user": f"U{rng.randrange(config.users):05d}",
+            "text": _text(rng, config.text_words),
+        }
+        if config.thread_every and n % config.thread_every == 0:
+            message["thread_ts"] = message["ts"]
+            message["reply_count"] = config.replies_per_thread
+        messages.append(message)
+    return messages
+
+
+def make_slack_app(config: SlackConfig) -> web.Application:
+    requests = {"count": 0}
+
+    async def handle(request: web.Request) -> web.Response:
+        requests["count"] += 1
+        await asyncio.sleep(config.latency)
+        if config.rate_limit_every and requests["count"] % config.rate_limit_every == 0:
+            return web.json_response({"ok": False, "error": "ratelimited"}, status=429,
+                                     headers={"Retry-After": str(config.retry_after)})
+        params = dict(request.query)
+        if request.can_read_body:
+            params.update(await request.post())
+        method = request.match_info["method"]
+        handler = METHODS.get(method)
+        if handler is None:
+            return web.json_response({"ok": False, "error": "unknown_method"})
+        return web.json_response(handler(params))
+
+    def paginate(items, params, key):
+        limit = int(params.get("limit") or 100)
+        offset = int(params.get("cursor") or 0)
+        page = items[offset:offset + limit]
+        next_cursor = str(offset + limit) if offset + limit < len(items) else ""
+        return {"ok": True, key: page, "has_more": bool(next_cursor), "response_metadata": {"next_cursor": next_cursor}}
+
+    def history(params):
+        latest = float(params.get("latest") or time.time())
+        oldest = float(params.get("oldest") or latest - 86400)
+        inclusive = str(params.get("inclusive", "")).lower() in ("1", "true")
+        messages = [
+            m for m in channel_messages(config, params["channel"], oldest - 1, latest + 1)
+            if (oldest <= float(m["ts"]) <= latest if inclusive else oldest < float(m["ts"]) < latest)
+        ]
+        return paginate(messages, params, "messages")
+
+    def replies(params):
+        parent_ts = float(params["ts"])
+        rng = random.Random(f"{params['channel']}:{params['ts']}:replies")
+        parent = {"type": "message", "ts": params["ts"], "thread_ts": params["ts"],
+                  "reply_count": config.replies_per_thread, "user": "U00000", "text": _text(rng, config.text_words)}
+        thread = [parent] + [
+            {"type": "message", "ts": f"{parent_ts + i + 1:.6f}", "thread_ts": params["ts"],
+             "user": f"U{rng.randrange(config.users):05d}", "text": _text(rng, config.text_words)}
+            for i in range(config.replies_per_thread)
+        ]
+        return paginate(thread, params, "messages")
+
+    def users_list(params):
+        members = [
+            {"id": f"U{i:05d}", "name": f"user{i}", "real_name": f"User {i}", "deleted": False, "is_bot": False,
+             "profile": {"display_name": f"user{i}", "real_name": f"User {i}"}}
+            for i in range(config.users)
+        ]
+        return paginate(members, params, "members")
+
+    def conversations_list(params):
+        return {"ok": True, "channels": [{"id": "CBENCH0", "name": "bench"}], "response_metadata": {"next_cursor": ""}}
+
+    METHODS = {
+        "conversations.history": history,
+        "conversations.replies": replies,
+        "users.list": users_list,
+        "conversations.list": conversations_list,
+    }
+
+    app = web.Application()
+    app["requests"] = requests
+    app.router.add_route("*", "/api/{method}", handle)
+    return app
+
+
+def llm_reply(messages, tokens: int) -> str:
+    prompt = " ".join(message.get("content") or "" for message in messages)
+    if "JSON array" in prompt:
+        actions = [
+            {"action": f"Follow up on item {i}", "reasoning": "Benchmark", "priority": "medium", "category": "support"}
+            for i in range(3)
+        ]
+        return json.dumps(actions)
+    rng = random.Random(len(prompt))
+    return "## Summary\n" + " ".join(rng.choice(WORDS) for _ in range(tokens))
+
+
+def make_llm_app(config: LLMConfig) -> web.Application:
+    async def completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        content = llm_reply(body.get("messages", []), config.tokens)
+        await asyncio.sleep(config.latency)
+        if not body.get("stream"):
+            # Non-streaming responses still take as long as generating every token
+            await asyncio.sleep(config.token_delay * config.tokens)
+            return web.json_response({
+                "id": "bench", "object": "chat.completion", "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4,
+                          "completion_tokens": config.tokens},
+            })
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for piece in content.split(" "):
+            chunk = {"choices": [{"index": 0, "delta": {"content": piece + " "}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(config.token_delay)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    return app
+
+
+async def start_app(app: web.Application, port: int, host: str = "127.0.0.1") -> web.AppRunner:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slack-port", type=int, default=8101)
+    parser.add_argument("--llm-port", type=int, default=8102)
+    parser.add_argument("--slack-latency", type=float, default=SlackConfig.latency)
+    parser.add_argument("--messages-per-day", type=int, default=SlackConfig.messages_per_day)
+    parser.add_argument("--llm-latency", type=float, default=LLMConfig.latency)
+    parser.add_argument("--llm-tokens", type=int, default=LLMConfig.tokens)
+    args = parser.parse_args()
+
+    async def serve():
+        await start_app(make_slack_app(SlackConfig(latency=args.slack_latency, messages_per_day=args.messages_per_day)),
+                        args.slack_port)
+        await start_app(make_llm_app(LLMConfig(latency=args.llm_latency, tokens=args.llm_tokens)), args.llm_port)
+        print(f"Fake Slack API on http://127.0.0.1:{args.slack_port}/api/, "
+              f"fake LLM on http://127.0.0.1:{args.llm_port}/v1")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
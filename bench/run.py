@@ -0,0 +1,345 @@
+"""
+End-to-end benchmark for NosyWorker against local fakes.
+
+Starts the fake Slack and LLM APIs (bench/fake_services.py), the real Slack MCP
+server (part1/mcp_server.py) pointed at the fake Slack, and the real Flask app
+in-process with the fake Outlook MCP server (bench/fake_outlook_mcp.py). It then
+drives the HTTP endpoints at a fixed concurrency and writes p50/p95/p99
+latency and throughput per scenario to a JSON file.
+
+Scenarios:
+    summarize          POST /api/channels/<id>/summarize on Slack channels
+    summarize-outlook  POST /api/channels/<id>/summarize on an Outlook folder
+    refresh            POST /api/refresh-action-items, polled until the job finishes
+    email              POST /api/send-action-email
+
+Everything runs in a scratch directory, so local data/ and outputs/ are not touched.
+
+    python bench/run.py --scenarios summarize,refresh,email --concurrency 8 --requests 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
+import aiohttp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_services import SlackConfig, LLMConfig, make_slack_app, make_llm_app, start_app  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def percentile(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_latencies(latencies, errors: int, elapsed: float, concurrency: int) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(values, 50) * 1000,
+            "p95": percentile(values, 95) * 1000,
+            "p99": percentile(values, 99) * 1000,
+            "mean": sum(values) / len(values) * 1000 if values else 0.0,
+            "max": values[-1] * 1000 if values else 0.0,
+        },
+    }
+
+
+def prepare_workdir(args) -> str:
+    """Scratch tree with the channel config and summary files the app reads from its cwd."""
+    workdir = tempfile.mkdtemp(prefix="nosyworker-bench-")
+    for directory in ("configs", "outputs", "part2", "data"):
+        os.makedirs(os.path.join(workdir, directory))
+    channels = [
+        {"id": f"slack-{i}", "name": f"Bench Slack {i}", "type": "slack", "slack_channel_id": f"CBENCH{i}"}
+        for i in range(args.channels)
+    ]
+    channels.append({"id": "outlook-0", "name": "Bench Inbox", "type": "outlook", "outlook_folder": "inbox"})
+    with open(os.path.join(workdir, "configs", "channels.json"), "w") as f:
+        json.dump({"channels": channels}, f, indent=4)
+    for i in range(args.summary_files):
+        write_summary(workdir, i, 0)
+    with open(os.path.join(workdir, "fake_outlook.json"), "w") as f:
+        json.dump({"latency": args.outlook_latency}, f)
+    return workdir
+
+
+def write_summary(workdir: str, index: int, revision: int):
+    path = os.path.join(workdir, "outputs", f"summary_20250101_{index:06d}.md")
+    with open(path, "w") as f:
+        f.write(f"# Client meeting {index} (revision {revision})\n\n- The client asked for a follow-up on item {index}.\n")
+
+
+class FakeServices:
+    """Fake Slack and LLM APIs on their own event loop thread."""
+
+    def __init__(self, slack_config: SlackConfig, llm_config: LLMConfig):
+        self.slack_port = free_port()
+        self.llm_port = free_port()
+        self.loop = asyncio.new_event_loop()
+        self._runners = []
+        self._thread = threading.Thread(target=self.loop.run_forever, name="bench-fakes", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(slack_config, llm_config), self.loop).result(10)
+
+    async def _start(self, slack_config, llm_config):
+        self.slack_app = make_slack_app(slack_config)
+        self._runners.append(await start_app(self.slack_app, self.slack_port))
+        self._runners.append(await start_app(make_llm_app(llm_config), self.llm_port))
+
+    def stop(self):
+        async def cleanup():
+            for runner in self._runners:
+                await runner.cleanup()
+        asyncio.run_coroutine_threadsafe(cleanup(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def start_mcp_server(slack_port: int, args) -> Tuple[subprocess.Popen, int]:
+    port = free_port()
+    env = dict(
+        os.environ,
+        SLACK_API_URL=f"http://127.0.0.1:{slack_port}/api/",
+        SLACK_MCP_PORT=str(port),
+        SLACK_BOT_TOKEN="xoxb-bench",
+        SLACK_USER_TOKEN="xoxp-bench",
+        SLACK_HISTORY_RPM=str(args.slack_rpm),
+        SLACK_REPLIES_RPM=str(args.slack_rpm),
+        SLACK_USERS_RPM=str(args.slack_rpm),
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "part1", "mcp_server.py")],
+        env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    wait_for_port(port)
+    return process, port
+
+
+class AsgiServer:
+    """Gives a uvicorn server the `shutdown()` of Werkzeug's server."""
+
+    def __init__(self, server, thread: threading.Thread):
+        self.server = server
+        self.thread = thread
+
+    def shutdown(self):
+        # Waits for the lifespan shutdown, which closes the MCP sessions
+        self.server.should_exit = True
+        self.thread.join(30)
+
+
+def start_flask_app(workdir: str, services: FakeServices, mcp_port: int, args):
+    """Import app.py inside the scratch directory and serve it on a thread."""
+    os.environ.update(
+        SLACK_MCP_URL=f"http://127.0.0.1:{mcp_port}/mcp",
+        OUTLOOK_MCP_COMMAND=sys.executable,
+        OUTLOOK_MCP_SCRIPT=os.path.join(BENCH_DIR, "fake_outlook_mcp.py"),
+        TOGETHER_BASE_URL=f"http://127.0.0.1:{services.llm_port}/v1",
+        TOGETHER_API_KEY="bench",
+    )
+    if not args.summary_cache:
+        os.environ["SUMMARY_CACHE_TTL"] = "0"
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    port = free_port()
+    if args.server == "asgi":
+        import uvicorn
+        import asgi
+
+        server = uvicorn.Server(uvicorn.Config(asgi.application, host="127.0.0.1", port=port,
+                                               lifespan="on", log_level="warning"))
+        thread = threading.Thread(target=server.run, name="bench-asgi", daemon=True)
+        thread.start()
+        wait_for_port(port)
+        return AsgiServer(server, thread), port
+
+    from werkzeug.serving import make_server
+    import app as nosyworker
+
+    server = make_server("127.0.0.1", port, nosyworker.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-flask", daemon=True).start()
+    return server, port
+
+
+async def run_scenario(name: str, base_url: str, args, workdir: str) -> dict:
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=args.window_days)
+    window = {"startTime": start.isoformat(), "endTime": end.isoformat()}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, errors = [], 0
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+
+    async def one(session: aiohttp.ClientSession, i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if name == "summarize":
+                    url = f"{base_url}/api/channels/slack-{i % args.channels}/summarize"
+                    async with session.post(url, json=window) as response:
+                        ok = response.status == 200 and (await response.json()).get("success")
+                elif name == "summarize-outlook":
+                    async with session.post(f"{base_url}/api/channels/outlook-0/summarize", json=window) as response:
+                        ok = response.status == 200 and (await response.json()).get("success")
+                elif name == "refresh":
+                    # Change a few summaries so every refresh has LLM work to do
+                    for k in range(args.refresh_changed):
+                        write_summary(workdir, (i * args.refresh_changed + k) % args.summary_files, i + 1)
+                    async with session.post(f"{base_url}/api/refresh-action-items") as response:
+                        job_id = (await response.json())["job_id"]
+                    while True:
+                        async with session.get(f"{base_url}/api/jobs/{job_id}") as response:
+                            status = (await response.json())["job"]["status"]
+                        if status in ("succeeded", "failed"):
+                            ok = status == "succeeded"
+                            break
+                        await asyncio.sleep(0.05)
+                elif name == "email":
+                    payload = {"to": f"client{i}@example.com", "subject": f"Follow-up {i}", "message": "Benchmark message"}
+                    async with session.post(f"{base_url}/api/send-action-email", json=payload) as response:
+                        ok = response.status == 200 and (await response.json()).get("success")
+                else:
+                    raise ValueError(f"Unknown scenario: {name}")
+            except Exception as e:
+                if args.verbose:
+                    print(f"[bench] {name} request {i} failed: {e}")
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        # One untimed request warms up MCP sessions, the user directory and connection pools
+        for i in range(args.warmup):
+            await one(session, -1 - i)
+        latencies.clear()
+        errors = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(one(session, i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+    return summarize_latencies(latencies, errors, elapsed, args.concurrency)
+
+
+async def fetch_json(url: str) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            return await response.json()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="summarize,refresh,email")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests before each scenario")
+    parser.add_argument("--channels", type=int, default=4, help="Slack channels to spread summarize requests over")
+    parser.add_argument("--window-days", type=float, default=1.0)
+    parser.add_argument("--summary-files", type=int, default=20)
+    parser.add_argument("--refresh-changed", type=int, default=2, help="summaries rewritten before each refresh")
+    parser.add_argument("--summary-cache", action="store_true", help="keep the summary cache on (off by default)")
+    parser.add_argument("--slack-latency", type=float, default=SlackConfig.latency)
+    parser.add_argument("--slack-rpm", type=float, default=60000, help="MCP server rate limit for the fake Slack")
+    parser.add_argument("--slack-rate-limit-every", type=int, default=0, help="fake Slack answers every Nth call with 429")
+    parser.add_argument("--messages-per-day", type=int, default=SlackConfig.messages_per_day)
+    parser.add_argument("--message-words", type=int, default=SlackConfig.text_words)
+    parser.add_argument("--outlook-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=LLMConfig.latency)
+    parser.add_argument("--llm-tokens", type=int, default=LLMConfig.tokens)
+    parser.add_argument("--llm-token-delay", type=float, default=LLMConfig.token_delay)
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--output", default=None, help="results file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi",
+                        help="threaded Werkzeug server or asgi.py under uvicorn (one worker)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    output = os.path.abspath(output)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+
+    workdir = prepare_workdir(args)
+    services = FakeServices(
+        SlackConfig(latency=args.slack_latency, messages_per_day=args.messages_per_day, text_words=args.message_words,
+                    rate_limit_every=args.slack_rate_limit_every),
+        LLMConfig(latency=args.llm_latency, tokens=args.llm_tokens, token_delay=args.llm_token_delay),
+    )
+    mcp_process, mcp_port = start_mcp_server(services.slack_port, args)
+    server = None
+    try:
+        server, port = start_flask_app(workdir, services, mcp_port, args)
+        base_url = f"http://127.0.0.1:{port}"
+        results = {}
+        for name in scenarios:
+            print(f"[bench] {name}: {args.requests} requests at concurrency {args.concurrency}")
+            results[name] = asyncio.run(run_scenario(name, base_url, args, workdir))
+            latency = results[name]["latency_ms"]
+            print(f"[bench] {name}: p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, "
+                  f"p99 {latency['p99']:.0f} ms, {results[name]['throughput_rps']:.1f} req/s, "
+                  f"{results[name]['errors']} errors")
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "config": vars(args),
+            "scenarios": results,
+            "fake_slack_requests": services.slack_app["requests"]["count"],
+            "cache_stats": asyncio.run(fetch_json(f"{base_url}/api/cache/stats")),
+        }
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[bench] Results written to {output}")
+    finally:
+        if server is not None:
+            server.shutdown()
+        mcp_process.terminate()
+        mcp_process.wait(10)
+        services.stop()
+
+
+if __name__ == "__main__":
+    main()
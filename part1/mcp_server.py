@@ -1,23 +1,77 @@
 from fastmcp import FastMCP
-from slack_sdk import WebClient
+from slack_sdk.web.async_client import AsyncWebClient
 from slack_sdk.errors import SlackApiError
+import aiohttp
+import asyncio
 import os
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 import time
 
-# Initialize MCP server
-bot_client = WebClient(token=os.environ.get("SLACK_BOT_TOKEN"))
-user_client = WebClient(token=os.environ.get("SLACK_USER_TOKEN"))
+from slack_pagination import (
+    SlackRateLimiter, fetch_history, fetch_threads, fetch_users, paginate_replies, HISTORY_RPM, REPLIES_RPM, USERS_RPM
+)
+
+# Initialize MCP server; SLACK_API_URL points the clients at another Slack-compatible API (e.g. the benchmark fake)
+SLACK_API_URL = os.environ.get("SLACK_API_URL", AsyncWebClient.BASE_URL)
+bot_client = AsyncWebClient(token=os.environ.get("SLACK_BOT_TOKEN"), base_url=SLACK_API_URL)
+user_client = AsyncWebClient(token=os.environ.get("SLACK_USER_TOKEN"), base_url=SLACK_API_URL)
+SLACK_MAX_CONNECTIONS = int(os.environ.get("SLACK_MAX_CONNECTIONS", "32"))
+# Concurrent calls allowed per tool; the rest wait instead of piling onto Slack
+TOOL_CONCURRENCY = int(os.environ.get("SLACK_TOOL_CONCURRENCY", "8"))
+# conversations.history is a Tier 3 method; the bucket is shared by every tool call
+history_limiter = SlackRateLimiter(HISTORY_RPM)
+replies_limiter = SlackRateLimiter(REPLIES_RPM)
+users_limiter = SlackRateLimiter(USERS_RPM)
 logger = logging.getLogger(__name__)
-mcp = FastMCP(name="My MCP Server")
+
+_http_session = None
+# One users.list sweep at a time; concurrent callers wait and reuse its result
+_tool_semaphores = {"get_user_directory": asyncio.Semaphore(1)}
+# Last users.list result shared by all callers: {"users": {...}, "fetched_at": float}
+_user_directory = None
+
+
+def http_session() -> aiohttp.ClientSession:
+    """Keep-alive connection pool shared by both Slack clients, created on the server's event loop."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=SLACK_MAX_CONNECTIONS, keepalive_timeout=60)
+        )
+        bot_client.session = user_client.session = _http_session
+    return _http_session
+
+
+@asynccontextmanager
+async def server_lifespan(server):
+    """Close the shared connection pool when the server shuts down."""
+    try:
+        yield {}
+    finally:
+        if _http_session is not None and not _http_session.closed:
+            await _http_session.close()
+
+
+mcp = FastMCP(name="My MCP Server", lifespan=server_lifespan)
+
+
+@asynccontextmanager
+async def tool_call(name: str):
+    """Hold one of the tool's concurrency slots for the duration of a Slack call."""
+    http_session()
+    semaphore = _tool_semaphores.setdefault(name, asyncio.Semaphore(TOOL_CONCURRENCY))
+    async with semaphore:
+        yield
 
 
 @mcp.tool
-def list_public_channels() -> dict:
+async def list_public_channels() -> dict:
     """Return all public channels in the Slack workspace"""
     try:
-        response = bot_client.conversations_list()
+        async with tool_call("list_public_channels"):
+            response = await bot_client.conversations_list()
         return {"result": response.data}
     except SlackApiError as e:
         logger.error(f"Error listing channels: {e}")
@@ -25,50 +79,71 @@ def list_public_channels() -> dict:
         
 
 @mcp.tool
-def get_channel_history(channel_id: str, limit: int = 100, oldest: str = "", latest: str = "") -> dict:
+async def get_channel_history(channel_id: str, limit: int = 0, oldest: str = "", latest: str = "", page_size: int = 200,
+                        expand_threads: bool = False, thread_format: str = "nested") -> dict:
     """Get message history from a Slack channel
     
     Args:
         channel_id: The ID of the channel to get history from
-        limit: Maximum number of messages to retrieve (default: 100)
+        limit: Maximum number of messages to retrieve, newest first (default: 0, no limit)
         oldest: Start of time range of messages to include (Unix timestamp)
         latest: End of time range of messages to include (Unix timestamp)
+        page_size: Messages requested per API call (default: 200, Slack's maximum is 999)
+        expand_threads: Also fetch the replies of every threaded message (default: False)
+        thread_format: "nested" (replies under each parent's "replies") or "flat" (replies merged into messages)
     """
     try:
-        all_messages = []
-        cursor = None
-        
-        while True:
-            params = {
-                "channel": channel_id,
-                "limit": limit
-            }
-            if oldest != "":
-                params["oldest"] = oldest
-            if latest != "":
-                params["latest"] = latest
-            if cursor:
-                params["cursor"] = cursor
-                
-            response = bot_client.conversations_history(**params)
-            
-            # Add messages from this batch to our collection
-            if response.data.get("messages"):
-                all_messages.extend(response.data["messages"])
-            
-            # Check if there are more messages to fetch
-            cursor = response.data.get("response_metadata", {}).get("next_cursor")
-            if not cursor:
-                break
-                
-        # Create a new response object with all messages
-        response.data["messages"] = all_messages
-        return {"result": response.data}
+        async with tool_call("get_channel_history"):
+            history = await fetch_history(
+                bot_client,
+                history_limiter,
+                channel_id,
+                oldest=float(oldest) if oldest != "" else None,
+                latest=float(latest) if latest != "" else None,
+                limit=limit,
+                page_size=page_size
+            )
+            if expand_threads:
+                history["messages"], thread_stats = await fetch_threads(
+                    bot_client, replies_limiter, channel_id, history["messages"], thread_format, page_size
+                )
+                history["stats"]["threads"] = thread_stats
+        return {"result": {"ok": True, "channel": channel_id, **history}}
     except SlackApiError as e:
         logger.error(f"Error getting channel history: {e}")
         return {"result": None, "error": str(e)}
 
 
+@mcp.tool
+async def get_user_directory(max_age: int = 3600, include_deleted: bool = False) -> dict:
+    """Get every user and bot in the workspace, keyed by user ID, for resolving message senders
+    
+    Args:
+        max_age: Reuse the server's copy if it is at most this many seconds old (default: 3600)
+        include_deleted: Include deactivated accounts (default: False)
+    """
+    global _user_directory
+    try:
+        async with tool_call("get_user_directory"):
+            if _user_directory is None or time.time() - _user_directory["fetched_at"] > max_age:
+                stats = {"api_calls": 0, "rate_limited": 0}
+                users = await fetch_users(bot_client, users_limiter, stats=stats)
+                _user_directory = {"users": users, "fetched_at": time.time(), "stats": stats}
+        users = _user_directory["users"]
+        if not include_deleted:
+            users = {user_id: user for user_id, user in users.items() if not user["deleted"]}
+        return {"result": {
+            "ok": True,
+            "users": users,
+            "count": len(users),
+            "fetched_at": _user_directory["fetched_at"],
+            "stats": _user_directory["stats"]
+        }}
+    except SlackApiError as e:
+        logger.error(f"Error listing users: {e}")
+        return {"result": None, "error": str(e)}
+
+
 @mcp.tool
 def datetime_to_timestamp(dt: str) -> dict:
     """Convert a datetime string to Unix timestamp
@@ -91,28 +166,27 @@ def datetime_to_timestamp(dt: str) -> dict:
 
 
 @mcp.tool
-def get_thread_replies(channel_id: str, thread_ts: str, limit: int = 100) -> dict:
+async def get_thread_replies(channel_id: str, thread_ts: str, limit: int = 0, page_size: int = 200) -> dict:
     """Get replies from a Slack message thread
     
     Args:
         channel_id: The ID of the channel containing the thread
         thread_ts: The timestamp of the parent message that started the thread
-        limit: Maximum number of replies to retrieve (default: 100)
+        limit: Maximum number of replies to retrieve (default: 0, no limit)
+        page_size: Replies requested per API call (default: 200)
     """
     try:
-        response = bot_client.conversations_replies(
-            channel=channel_id,
-            ts=thread_ts,
-            limit=limit
-        )
-        return {"result": response.data}
+        stats = {"api_calls": 0, "rate_limited": 0}
+        async with tool_call("get_thread_replies"):
+            replies = await paginate_replies(bot_client, replies_limiter, channel_id, thread_ts, page_size, limit, stats)
+        return {"result": {"ok": True, "channel": channel_id, "thread_ts": thread_ts, "messages": replies, "stats": stats}}
     except SlackApiError as e:
         logger.error(f"Error getting thread replies: {e}")
         return {"result": None, "error": str(e)}
 
 
 @mcp.tool
-def search_messages(query: str, count: int = 100, sort: str = "timestamp", sort_dir: str = "desc") -> dict:
+async def search_messages(query: str, count: int = 100, sort: str = "timestamp", sort_dir: str = "desc") -> dict:
     """Search for messages in Slack
     
     Args:
@@ -122,12 +196,13 @@ def search_messages(query: str, count: int = 100, sort: str = "timestamp", sort_
         sort_dir: Sort direction "asc" or "desc" (default: "desc")
     """
     try:
-        response = user_client.search_messages(
-            query=query,
-            count=count,
-            sort=sort,
-            sort_dir=sort_dir
-        )
+        async with tool_call("search_messages"):
+            response = await user_client.search_messages(
+                query=query,
+                count=count,
+                sort=sort,
+                sort_dir=sort_dir
+            )
         return {"result": response.data}
     except SlackApiError as e:
         logger.error(f"Error searching messages: {e}")
@@ -135,4 +210,4 @@ def search_messages(query: str, count: int = 100, sort: str = "timestamp", sort_
 
 
 if __name__ == "__main__":
-    mcp.run(transport="streamable-http", host="0.0.0.0", port=8000, path="/mcp")
\ No newline at end of file
+    mcp.run(transport="streamable-http", host="0.0.0.0", port=int(os.environ.get("SLACK_MCP_PORT", "8000")), path="/mcp")
\ No newline at end of file
@@ -1,18 +1,22 @@
 # suppress warnings
 import warnings
 import os
+import sys
 from datetime import datetime
 
 warnings.filterwarnings("ignore")
 
 import argparse
-from together import Together
 import textwrap
 import asyncio
 import json
 from fastmcp import Client
 from fastmcp.client.transports import StreamableHttpTransport
 
+# Make the repository root importable when run as `python part1/minimal.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.llm_client import llm_client
+
 # Create the transport with your MCP server URL
 server_url = "http://0.0.0.0:8000/mcp"
 transport = StreamableHttpTransport(server_url)
@@ -39,7 +43,7 @@ async def fetch_slack_conversation(channel_id):
         
         return json.loads(result[0].text)
 
-async def summarize_conversation(conversation, together_client, model="meta-llama/Meta-Llama-3-8B-Instruct-Lite"):
+async def summarize_conversation(conversation, client=llm_client, model="meta-llama/Meta-Llama-3-8B-Instruct-Lite"):
     """Summarize the conversation using TogetherAI."""
     system_prompt = """
     Summary instructions:
@@ -48,15 +52,7 @@ async def summarize_conversation(conversation, together_client, model="meta-llam
     - Focus and list out key points, decisions made, and tasks assigned.
     """
 
-    response = together_client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": conversation}
-        ],
-    )
-
-    return response.choices[0].message.content
+    return await client.complete(system_prompt, conversation, model)
 
 def read_conversation_from_file(file_path):
     """Read conversation data from a JSON file."""
@@ -98,9 +94,6 @@ async def main():
     parser.add_argument("-f", "--file", type=str, help="Path to JSON file containing conversation (optional)")
     args = parser.parse_args()
 
-    # Initialize TogetherAI client
-    together_client = Together(api_key=os.environ.get("TOGETHER_API_KEY"))
-
     # Get conversation data either from Slack or file
     if args.file:
         print(f"Reading conversation from file {args.file}...")
@@ -124,7 +117,7 @@ async def main():
     # print(formatted_conversation)
     # Summarize the conversation
     print("\nSummarizing conversation...")
-    summary = await summarize_conversation(str(conversation_data), together_client)
+    summary = await summarize_conversation(str(conversation_data))
     
     # Print the summary
     print("-" * 50)
@@ -136,4 +129,7 @@ async def main():
     print(f"\nSummary saved to: {saved_file}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        llm_client.close()
\ No newline at end of file
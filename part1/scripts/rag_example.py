@@ -4,10 +4,11 @@ import warnings
 warnings.filterwarnings("ignore")
 
 import os
-from together import Together
-import faiss
+import sys
 
-from sentence_transformers import SentenceTransformer
+# Make the repository root importable when run as `python part1/scripts/rag_example.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from services.rag_service import RAGService
 
 """
 Do these steps:
@@ -15,126 +16,55 @@ Do these steps:
 """
 together_api_key = os.environ.get("TOGETHER_API_KEY")
 
+# Index and document metadata persist here between runs
+RAG_INDEX_DIR = os.environ.get("RAG_INDEX_DIR", os.path.join("data", "rag_example"))
+
+_rag_service = None
+
+
+def get_rag_service() -> RAGService:
+    """Return the process-wide RAG service (embedding model loaded once, index loaded from disk)."""
+    global _rag_service
+    if _rag_service is None:
+        _rag_service = RAGService(RAG_INDEX_DIR)
+    return _rag_service
+
 
 def run_rag(data_dict: dict, prompt: str):
     """
-    Run RAG system: process documents, create embeddings, search, and generate answer.
+    Run RAG system: sync documents into the persistent index, search, and generate answer.
 
+    Only documents that are new or changed since the last run are embedded.
     """
+    service = get_rag_service()
 
-    # Stage 0: Initialize Together AI client for LLM completions
-    client = Together(api_key=together_api_key)
-
-    # Stage 1: Load sentence transformer model for creating embeddings
-    # ------------------------------------------------------------
-    embedding_model = SentenceTransformer(
-        "sentence-transformers/all-MiniLM-L6-v2",
-        use_auth_token=os.environ.get("HUGGINGFACE_HUB_TOKEN"),
-    )
-
-    # Stage 2: Process documents into Vector Database
+    # Stage 1: Sync documents into the vector database
     # ------------------------------------------------------------
-    documents = []
-    filenames = []
-
     print(f"Processing {len(data_dict)} documents...")
-    for key, content in data_dict.items():
-        content = content.strip()
-        if content:  # Only add non-empty documents
-            documents.append(content)
-            filenames.append(key)
-            print(f"✅ Loaded: {key}")
-
+    documents = {key: content for key, content in data_dict.items() if content.strip()}
     if not documents:
         return "No valid documents found in data dictionary!"
+    stats = service.sync_documents(documents)
+    print(f"✅ RAG system ready with {stats['total']} documents ({stats['added']} embedded, {stats['removed']} removed)")
 
-    # Create embeddings for all documents
-    print("Creating embeddings...")
-    embeddings = embedding_model.encode(documents)
-
-    # Set up FAISS index for similarity search
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dimension)
-
-    # Normalize embeddings for cosine similarity
-    faiss.normalize_L2(embeddings)
-    index.add(embeddings)
-
-    print(f"✅ RAG system ready with {len(documents)} documents!")
-
-    # Stage 3: Retrieve relevant documents
-    # ------------------------------------------------------------
-    query_embedding = embedding_model.encode([prompt])
-    faiss.normalize_L2(query_embedding)
-
-    # Get top similar documents
-    scores, indices = index.search(query_embedding, min(3, len(documents)))
-
-    # Stage 4: Build context from retrieved documents
+    # Stage 2: Retrieve relevant documents and generate an answer
     # ------------------------------------------------------------
-    relevant_docs = []
-    context_parts = []
-
-    for score, idx in zip(scores[0], indices[0]):
-        if idx < len(documents):
-            doc_info = {
-                "content": documents[idx],
-                "filename": filenames[idx],
-                "score": float(score),
-            }
-            relevant_docs.append(doc_info)
-            context_parts.append(f"[{doc_info['filename']}]\n{doc_info['content']}")
-
+    try:
+        result = service.answer(prompt, k=3)
+    except Exception as e:
+        return f"Error generating answer: {str(e)}"
+    relevant_docs = result["sources"]
     if not relevant_docs:
         return "No relevant documents found for the query."
 
-    # Combine context
-    context = "\n\n".join(context_parts)
-
-    # Stage 5: Augment by running the LLM to generate an answer
-    # ------------------------------------------------------------
-    llm_prompt = f"""Answer the question based on the provided context documents.
-
-    Context:
-    {context}
-
-    Question: {prompt}
+    # Display source information
+    print(f"\n📚 Most relevant source:")
+    for doc in relevant_docs:
+        print(f"  • {doc['key']} (similarity: {doc['score']:.3f})")
 
-    Instructions:
-    - Answer based only on the information in the context
-    - Answer should beat least 10 words at max 20 words
-    - If the context doesn't contain enough information, say so
-    - Mention which document(s) you're referencing
-    - Start with According to [document name]
-    - Add brackets to the document name
-
-
-    Answer:"""
-
-    try:
-        # Generate answer using Together AI
-        response = client.chat.completions.create(
-            model="meta-llama/Llama-3.3-70B-Instruct-Turbo",
-            messages=[{"role": "user", "content": llm_prompt}],
-            max_tokens=500,
-            temperature=0.7,
-        )
-        answer = response.choices[0].message.content
-
-        # Display source information
-        print(f"\n📚 Most relevant source:")
-        for doc in relevant_docs:
-            print(f"  • {doc['filename']} (similarity: {doc['score']:.3f})")
-
-        # Add source information to the answer
-        sources_list = [doc["filename"] for doc in relevant_docs]
-        sources_text = sources_list[0]
-        full_answer = f"{answer}\n\n📄 Source Used: {sources_text}"
-
-        return full_answer
-
-    except Exception as e:
-        return f"Error generating answer: {str(e)}"
+    # Add source information to the answer
+    sources_text = relevant_docs[0]["key"]
+    return f"{result['answer']}\n\n📄 Source Used: {sources_text}"
 
 
 if __name__ == "__main__":
@@ -0,0 +1,258 @@
+"""
+Rate-limit-aware pagination for Slack Web API history, replies and users calls.
+
+`SlackRateLimiter` is a token bucket per Slack method tier, shared by every
+tool call of the MCP server; a 429 pauses the whole bucket for `Retry-After`
+seconds instead of failing the call. `fetch_history` splits a long
+[oldest, latest] range into sub-windows, pages through them concurrently and
+returns the merged messages newest first, the order conversations.history uses.
+`fetch_threads` then fetches the replies of every threaded parent concurrently
+with full cursor pagination, and `fetch_users` pages through users.list for
+the sender directory. Everything runs on the server's event loop with
+`AsyncWebClient`.
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from slack_sdk.errors import SlackApiError
+
+# Slack's documented per-method tiers (requests per minute)
+TIER_RATES = {1: 1, 2: 20, 3: 50, 4: 100}
+HISTORY_RPM = float(os.environ.get("SLACK_HISTORY_RPM", TIER_RATES[3]))
+HISTORY_WINDOW_SECONDS = float(os.environ.get("SLACK_HISTORY_WINDOW_SECONDS", 7 * 86400))
+HISTORY_CONCURRENCY = int(os.environ.get("SLACK_HISTORY_CONCURRENCY", "4"))
+REPLIES_RPM = float(os.environ.get("SLACK_REPLIES_RPM", TIER_RATES[3]))
+REPLIES_CONCURRENCY = int(os.environ.get("SLACK_REPLIES_CONCURRENCY", "4"))
+USERS_RPM = float(os.environ.get("SLACK_USERS_RPM", TIER_RATES[2]))
+
+
+class SlackRateLimiter:
+    """Token bucket for one event loop that also honours Retry-After pauses."""
+
+    def __init__(self, requests_per_minute: float, burst: Optional[int] = None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(requests_per_minute // 10)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    async def acquire(self):
+        # No lock needed: the check and the decrement run without an await in between
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if now < self.paused_until:
+                wait = self.paused_until - now
+            elif self.tokens >= 1:
+                self.tokens -= 1
+                return
+            else:
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+def retry_after(error: SlackApiError) -> Optional[float]:
+    """Seconds to wait if `error` is a rate limit, else None."""
+    response = error.response
+    if response is None or response.status_code != 429:
+        return None
+    try:
+        return float(response.headers.get("Retry-After", 1))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+async def call_with_retry(method: Callable[..., Awaitable], limiter: SlackRateLimiter, max_retries: int = 5,
+                          stats: Optional[dict] = None, **params):
+    """Call an AsyncWebClient method under `limiter`, waiting out 429s up to `max_retries` times."""
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        if stats is not None:
+            stats["api_calls"] = stats.get("api_calls", 0) + 1
+        try:
+            return await method(**params)
+        except SlackApiError as e:
+            wait = retry_after(e)
+            if wait is None or attempt >= max_retries:
+                raise
+            attempt += 1
+            if stats is not None:
+                stats["rate_limited"] = stats.get("rate_limited", 0) + 1
+            print(f"[DEBUG] Slack rate limited, retrying in {wait:.1f}s (attempt {attempt}/{max_retries})")
+            limiter.pause(wait)
+
+
+async def gather_limited(coros, max_concurrency: int) -> list:
+    """`asyncio.gather` with at most `max_concurrency` coroutines in flight, results in order."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+def split_window(oldest: float, latest: float, window_seconds: float) -> List[tuple]:
+    """Split [oldest, latest] into consecutive sub-windows of at most `window_seconds`."""
+    windows = []
+    start = oldest
+    while start < latest:
+        end = min(latest, start + window_seconds)
+        windows.append((start, end))
+        start = end
+    return windows or [(oldest, latest)]
+
+
+async def paginate_history(client, limiter: SlackRateLimiter, channel_id: str, oldest: Optional[float],
+                           latest: Optional[float], page_size: int, limit: int, stats: dict) -> List[Dict]:
+    """Page through one window with cursors; boundaries are inclusive, `limit` 0 means no cap."""
+    messages, cursor = [], None
+    while True:
+        params = {"channel": channel_id, "limit": page_size, "inclusive": True}
+        if oldest is not None:
+            params["oldest"] = f"{oldest:.6f}"
+        if latest is not None:
+            params["latest"] = f"{latest:.6f}"
+        if cursor:
+            params["cursor"] = cursor
+        response = await call_with_retry(client.conversations_history, limiter, stats=stats, **params)
+        messages.extend(response.data.get("messages", []))
+        cursor = response.data.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return messages
+        if limit and len(messages) >= limit:
+            stats["truncated"] = True
+            return messages
+
+
+async def fetch_history(client, limiter: SlackRateLimiter, channel_id: str, oldest: Optional[float] = None,
+                        latest: Optional[float] = None, limit: int = 0, page_size: int = 200,
+                        window_seconds: float = HISTORY_WINDOW_SECONDS,
+                        max_concurrency: int = HISTORY_CONCURRENCY) -> dict:
+    """Fetch history for (oldest, latest), newest first, using concurrent sub-windows for long ranges.
+
+    Like conversations.history, the outer bounds are exclusive. Returns
+    {"messages", "has_more", "stats"}.
+    """
+    if oldest is not None and latest is not None and latest - oldest > window_seconds:
+        windows = split_window(oldest, latest, window_seconds)
+    else:
+        windows = [(oldest, latest)]
+    window_stats = [{"api_calls": 0, "rate_limited": 0} for _ in windows]
+    # Newest windows first, so a capped fetch gets its most relevant pages early
+    batches = await gather_limited(
+        [
+            paginate_history(client, limiter, channel_id, windows[i][0], windows[i][1], page_size, limit, window_stats[i])
+            for i in reversed(range(len(windows)))
+        ],
+        max_concurrency,
+    )
+
+    merged = {}
+    for batch in batches:
+        for message in batch:
+            ts = float(message["ts"])
+            if (oldest is not None and ts <= oldest) or (latest is not None and ts >= latest):
+                continue
+            merged[message["ts"]] = message
+    messages = sorted(merged.values(), key=lambda message: float(message["ts"]), reverse=True)
+    has_more = any(stat.get("truncated") for stat in window_stats) or bool(limit) and len(messages) > limit
+    if limit:
+        messages = messages[:limit]
+    stats = {
+        "windows": len(windows),
+        "api_calls": sum(stat["api_calls"] for stat in window_stats),
+        "rate_limited": sum(stat["rate_limited"] for stat in window_stats),
+    }
+    return {"messages": messages, "has_more": has_more, "stats": stats}
+
+
+async def paginate_replies(client, limiter: SlackRateLimiter, channel_id: str, thread_ts: str, page_size: int = 200,
+                           limit: int = 0, stats: Optional[dict] = None) -> List[Dict]:
+    """Return every reply in a thread, oldest first, without the parent; `limit` 0 means no cap."""
+    replies, cursor = [], None
+    while True:
+        params = {"channel": channel_id, "ts": thread_ts, "limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        response = await call_with_retry(client.conversations_replies, limiter, stats=stats, **params)
+        replies.extend(msg for msg in response.data.get("messages", []) if msg.get("ts") != thread_ts)
+        cursor = response.data.get("response_metadata", {}).get("next_cursor")
+        if not cursor or (limit and len(replies) >= limit):
+            return replies[:limit] if limit else replies
+
+
+async def fetch_threads(client, limiter: SlackRateLimiter, channel_id: str, messages: List[Dict],
+                        thread_format: str = "nested", page_size: int = 200,
+                        max_concurrency: int = REPLIES_CONCURRENCY) -> Tuple[List[Dict], dict]:
+    """Fetch the replies of every parent with `reply_count > 0`.
+
+    "nested" puts each thread's replies (oldest first) under the parent's
+    `replies` key; "flat" merges them into the list, newest first like the
+    history itself. Returns (messages, stats).
+    """
+    parents = [msg for msg in messages if msg.get("reply_count", 0) > 0]
+    thread_stats = [{"api_calls": 0, "rate_limited": 0} for _ in parents]
+    threads = await gather_limited(
+        [
+            paginate_replies(client, limiter, channel_id, parent["ts"], page_size, stats=stats)
+            for parent, stats in zip(parents, thread_stats)
+        ],
+        max_concurrency,
+    )
+
+    stats = {
+        "threads": len(parents),
+        "replies": sum(len(replies) for replies in threads),
+        "api_calls": sum(stat["api_calls"] for stat in thread_stats),
+        "rate_limited": sum(stat["rate_limited"] for stat in thread_stats),
+    }
+    if thread_format == "flat":
+        merged = {msg["ts"]: msg for msg in messages}
+        for replies in threads:
+            for reply in replies:
+                merged.setdefault(reply["ts"], reply)
+        return sorted(merged.values(), key=lambda msg: float(msg["ts"]), reverse=True), stats
+    replies_by_parent = {parent["ts"]: replies for parent, replies in zip(parents, threads)}
+    return [
+        {**msg, "replies": replies_by_parent[msg["ts"]]} if msg["ts"] in replies_by_parent else msg
+        for msg in messages
+    ], stats
+
+
+def user_entry(member: Dict) -> Dict:
+    """The fields of a users.list member needed to render a sender."""
+    profile = member.get("profile") or {}
+    return {
+        "name": profile.get("display_name") or profile.get("real_name") or member.get("real_name") or member.get("name"),
+        "real_name": profile.get("real_name") or member.get("real_name"),
+        "handle": member.get("name"),
+        "is_bot": member.get("is_bot", False),
+        "bot_id": profile.get("bot_id"),
+        "deleted": member.get("deleted", False),
+    }
+
+
+async def fetch_users(client, limiter: SlackRateLimiter, page_size: int = 200,
+                      stats: Optional[dict] = None) -> Dict[str, Dict]:
+    """Page through users.list and return {user_id: user_entry}."""
+    users, cursor = {}, None
+    while True:
+        params = {"limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        response = await call_with_retry(client.users_list, limiter, stats=stats, **params)
+        for member in response.data.get("members", []):
+            users[member["id"]] = user_entry(member)
+        cursor = response.data.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return users
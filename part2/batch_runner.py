@@ -0,0 +1,195 @@
+"""
+Resumable, rate-limit-aware batch runner for LLM jobs.
+
+Jobs run on a bounded worker pool. Concurrency is cut in half whenever the API
+answers 429 and grows back one slot at a time on success, and requests are paced
+by a requests-per-minute token bucket. Retryable failures back off exponentially
+(or for the server's Retry-After). Every finished job is written to a JSON
+checkpoint together with a fingerprint of its input, so an interrupted run skips
+work that is already done.
+"""
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+from services.llm_client import LLMError
+
+
+class TokenBucket:
+    """Paces calls to at most `rate_per_minute`, allowing short bursts of `burst`."""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimit:
+    """Concurrency limit that halves on rate limiting and recovers additively."""
+
+    def __init__(self, maximum: int):
+        self.maximum = max(1, maximum)
+        self.limit = self.maximum
+        self.active = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def throttled(self):
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+
+    def succeeded(self):
+        self._successes += 1
+        if self.limit < self.maximum and self._successes >= self.limit:
+            self.limit += 1
+            self._successes = 0
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, LLMError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class BatchRunner:
+    def __init__(self, concurrency: int = 4, requests_per_minute: float = 60, max_retries: int = 4,
+                 base_delay: float = 1.0, checkpoint_path: Optional[str] = None):
+        self.limit = AdaptiveLimit(concurrency)
+        self.bucket = TokenBucket(requests_per_minute, burst=concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint = self._load_checkpoint()
+        self._checkpoint_lock = asyncio.Lock()
+
+    def _load_checkpoint(self) -> Dict:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return {}
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        directory, name = os.path.split(self.checkpoint_path)
+        with tempfile.NamedTemporaryFile('w', dir=directory or '.', prefix=name + '.', suffix='.tmp',
+                                         delete=False) as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(f.name, self.checkpoint_path)
+
+    async def _run_one(self, key: str, job: Callable[[], Awaitable]):
+        attempt = 0
+        while True:
+            async with self.limit:
+                await self.bucket.acquire()
+                try:
+                    result = await job()
+                    self.limit.succeeded()
+                    return result
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    error = e
+                    if getattr(e, 'status', None) == 429:
+                        self.limit.throttled()
+            attempt += 1
+            delay = getattr(error, 'retry_after', None) or self.base_delay * (2 ** (attempt - 1)) * (1 + random.random())
+            print(f"  Retrying {key} in {delay:.1f}s (attempt {attempt}/{self.max_retries}): {error}")
+            await asyncio.sleep(delay)
+
+    async def run(self, jobs: Dict[str, Callable[[], Awaitable]], fingerprints: Dict[str, str],
+                  on_progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Run `jobs` (key -> zero-argument coroutine function) and return key -> result.
+
+        Jobs whose key is in the checkpoint with the same fingerprint are not run
+        again. Jobs that fail, or return None, are left out of the result.
+        """
+        results = {}
+        pending = {}
+        for key, job in jobs.items():
+            entry = self.checkpoint.get(key)
+            if entry and entry.get('fingerprint') == fingerprints.get(key):
+                results[key] = entry['result']
+            else:
+                pending[key] = job
+        total = len(jobs)
+        done = len(results)
+        if results:
+            print(f"Skipping {done} of {total} jobs already checkpointed")
+        if on_progress:
+            on_progress(done, total)
+
+        async def run_and_record(key, job):
+            nonlocal done
+            try:
+                result = await self._run_one(key, job)
+            except Exception as e:
+                print(f"  Failed {key}: {e}")
+                result = None
+            if result is not None:
+                results[key] = result
+                async with self._checkpoint_lock:
+                    self.checkpoint[key] = {'fingerprint': fingerprints.get(key), 'result': result}
+                    self._save_checkpoint()
+            done += 1
+            if on_progress:
+                on_progress(done, total)
+
+        await asyncio.gather(*(run_and_record(key, job) for key, job in pending.items()))
+        # Keep the order the jobs were given in
+        return {key: results[key] for key in jobs if key in results}
+
+    def pending(self, fingerprints: Dict[str, str]) -> Dict[str, str]:
+        """Return the keys (and fingerprints) that are not checkpointed with the same fingerprint."""
+        return {
+            key: fingerprint for key, fingerprint in fingerprints.items()
+            if (self.checkpoint.get(key) or {}).get('fingerprint') != fingerprint
+        }
+
+    def prune(self, keep) -> list:
+        """Drop checkpoint entries whose key is not in `keep`; returns the dropped keys.
+
+        An empty `keep` drops nothing: it more likely means the inputs were not
+        found than that every one of them was deleted.
+        """
+        if not keep:
+            return []
+        dropped = [key for key in self.checkpoint if key not in keep]
+        for key in dropped:
+            del self.checkpoint[key]
+        if dropped:
+            self._save_checkpoint()
+        return dropped
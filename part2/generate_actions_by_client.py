@@ -1,13 +1,27 @@
 import os
+import sys
 import json
 import glob
-from together import Together
+import hashlib
 import re
+import tempfile
 from datetime import datetime
 
+# Make the repository root importable when run as `python3 part2/generate_actions_by_client.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.llm_client import llm_client
+from services.background_loop import background_loop
+from part2.batch_runner import BatchRunner
+
 OUTPUTS_PATH = './outputs'
 RESULTS_PATH = '../part1/results'
 MODEL = 'meta-llama/Llama-3.3-70B-Instruct-Turbo'#'meta-llama/Meta-Llama-3-8B-Instruct-Lite'
+# Content hash and generated actions per summary file; doubles as the run checkpoint
+MANIFEST_PATH = './part2/actions_manifest.json'
+ALL_ACTIONS_PATH = './part2/all_actions.json'
+CLIENT_ACTIONS_PATH = './part2/actions_by_client.json'
+CONCURRENCY = int(os.environ.get('ACTIONS_CONCURRENCY', '4'))
+REQUESTS_PER_MINUTE = float(os.environ.get('ACTIONS_REQUESTS_PER_MINUTE', '60'))
 
 # Client mapping - you can update this based on your actual client names
 CLIENT_MAPPING = {
@@ -70,36 +84,8 @@ def get_summary_files():
     all_files = outputs_files #+ results_files
     return all_files
 
-def process_summary(summary_path):
-    """Process a single summary file and generate actions."""
-    print(f"Processing: {os.path.basename(summary_path)}")
-    
-    # Read the summary
-    with open(summary_path, 'r') as f:
-        summary = f.read()
-
-    # Identify client
-    client_name = identify_client(summary)
-    print(f"  Identified client: {client_name}")
-
-    # Prepare Together client
-    api_key = os.environ.get('TOGETHER_API_KEY')
-    if not api_key:
-        raise ValueError('TOGETHER_API_KEY not set in environment')
-    client = Together(api_key=api_key)
-
-    # Prepare prompt
-    prompt = PROMPT.format(summary=summary)
-
-    # Call Together AI
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-    )
-    content = response.choices[0].message.content.strip()
-
+def parse_actions(content, summary_path, client_name):
+    """Parse the LLM response into a list of actions and add metadata."""
     # Try to parse JSON from the response
     try:
         # Try to extract JSON from the response (in case there's extra text)
@@ -126,6 +112,104 @@ def process_summary(summary_path):
 
     return actions
 
+async def process_summary_async(summary_path, summary=None):
+    """Process a single summary file and generate actions."""
+    print(f"Processing: {os.path.basename(summary_path)}")
+    
+    # Read the summary
+    if summary is None:
+        with open(summary_path, 'r') as f:
+            summary = f.read()
+
+    # Identify client
+    client_name = identify_client(summary)
+    print(f"  Identified client: {client_name}")
+
+    # Prepare prompt
+    prompt = PROMPT.format(summary=summary)
+
+    # Call Together AI on the shared client
+    content = (await llm_client.complete(None, prompt, MODEL)).strip()
+    return parse_actions(content, summary_path, client_name)
+
+def file_fingerprint(summary):
+    return hashlib.sha256(summary.encode('utf-8')).hexdigest()
+
+def generate_all_actions(summary_files, on_progress=None):
+    """Generate actions for the summary files that are new or changed since the last run.
+
+    The manifest records each file's content hash and the actions generated from it,
+    so unchanged files cost no LLM call and deleted files are dropped. Returns
+    (all_results, stats) where all_results maps filename -> actions for every file.
+    """
+    fingerprints, summaries = {}, {}
+    for summary_path in summary_files:
+        filename = os.path.basename(summary_path)
+        with open(summary_path, 'r') as f:
+            summaries[filename] = (summary_path, f.read())
+        fingerprints[filename] = file_fingerprint(summaries[filename][1])
+
+    runner = BatchRunner(
+        concurrency=CONCURRENCY,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        checkpoint_path=MANIFEST_PATH,
+    )
+    removed = runner.prune(fingerprints)
+    pending = runner.pending(fingerprints)
+    if pending and not llm_client.api_key:
+        raise ValueError('TOGETHER_API_KEY not set in environment')
+
+    jobs = {}
+    for filename in fingerprints:
+        summary_path, summary = summaries[filename]
+        jobs[filename] = lambda path=summary_path, text=summary: process_summary_async(path, text)
+
+    all_results = background_loop.run(runner.run(jobs, fingerprints, on_progress)) if pending else {
+        filename: runner.checkpoint[filename]['result'] for filename in fingerprints
+    }
+    stats = {
+        'files': len(fingerprints),
+        'generated': sum(1 for filename in pending if filename in all_results),
+        'failed': sum(1 for filename in pending if filename not in all_results),
+        'reused': len(fingerprints) - len(pending),
+        'removed': len(removed),
+    }
+    return all_results, stats
+
+def write_json_if_changed(path, data):
+    """Write `data` as JSON unless the file already holds exactly that content."""
+    content = json.dumps(data, indent=2)
+    try:
+        with open(path, 'r') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    # A unique temp name, so concurrent writers never share a half-written file
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.',
+                                     suffix='.tmp', delete=False) as f:
+        f.write(content)
+    os.replace(f.name, path)
+    return True
+
+def refresh_action_items(on_progress=None):
+    """Bring all_actions.json and actions_by_client.json up to date with the summary files.
+
+    With no summary files at all (e.g. run from the wrong working directory) the
+    manifest and both output files are left alone and `stats['skipped']` says why.
+    """
+    summary_files = get_summary_files()
+    if not summary_files:
+        print("No summary files found; leaving the manifest and action files unchanged.")
+        stats = {'files': 0, 'generated': 0, 'failed': 0, 'reused': 0, 'removed': 0, 'changed': False,
+                 'skipped': 'no summary files found'}
+        return {}, {}, stats
+    all_results, stats = generate_all_actions(summary_files, on_progress)
+    client_organization = organize_by_client(all_results)
+    stats['changed'] = write_json_if_changed(ALL_ACTIONS_PATH, all_results)
+    stats['changed'] = write_json_if_changed(CLIENT_ACTIONS_PATH, client_organization) or stats['changed']
+    return all_results, client_organization, stats
+
 def organize_by_client(all_actions):
     """Organize actions by client with burger menu structure."""
     client_organization = {}
@@ -181,41 +265,16 @@ def main():
         print("No summary files found in outputs or part1/results directories.")
         return
     
-    print("Available summary files:")
-    for i, file_path in enumerate(summary_files):
-        print(f"{i+1}. {os.path.basename(file_path)}")
-    
-    # Process all summaries
-    all_results = {}
+    # Process new or changed summaries and merge with the manifest
+    all_results, client_organization, stats = refresh_action_items()
+    print(f"\n{stats['files']} summary files: {stats['generated']} generated, {stats['reused']} unchanged, "
+          f"{stats['failed']} failed, {stats['removed']} removed")
+    if stats['changed']:
+        print(f"All actions saved to {ALL_ACTIONS_PATH}")
+        print(f"Client-organized actions saved to {CLIENT_ACTIONS_PATH}")
     
-    for summary_path in summary_files:
-        filename = os.path.basename(summary_path)
-        actions = process_summary(summary_path)
-        
-        if actions:
-            all_results[filename] = actions
-            print(f"\nActions for {filename}:")
-            print(json.dumps(actions, indent=2))
-            print("-" * 50)
-    
-    # Organize by client
-    client_organization = organize_by_client(all_results)
-    
-    # Save both formats
+    # Print summary
     if all_results:
-        # Save original format
-        output_file = './part2/all_actions.json'
-        with open(output_file, 'w') as f:
-            json.dump(all_results, f, indent=2)
-        print(f"\nAll actions saved to {output_file}")
-        
-        # Save client-organized format
-        client_output_file = './part2/actions_by_client.json'
-        with open(client_output_file, 'w') as f:
-            json.dump(client_organization, f, indent=2)
-        print(f"Client-organized actions saved to {client_output_file}")
-        
-        # Print summary
         print("\n" + "="*60)
         print("CLIENT ACTION SUMMARY")
         print("="*60)
@@ -232,4 +291,7 @@ def main():
                     print(f"   📁 {category.title()}: {len(actions)} actions")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    try:
+        main()
+    finally:
+        llm_client.close()
\ No newline at end of file
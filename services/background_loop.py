@@ -0,0 +1,83 @@
+"""
+Long-lived asyncio event loop running in a daemon thread.
+
+Flask runs every `async def` view on a brand new event loop, so anything that
+has to outlive a single request (MCP child processes, HTTP connection pools)
+lives on this loop instead and is reached through `call()` / `run()`.
+"""
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    def __init__(self, name="nosyworker-loop"):
+        self._name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the background loop, starting its thread on first use."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                ready = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._serve, args=(ready,), name=self._name, daemon=True
+                )
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _serve(self, ready: threading.Event):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def in_loop(self) -> bool:
+        """True when called from a coroutine already running on the background loop."""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def call(self, coro):
+        """Await `coro` on the background loop from any other event loop."""
+        if self.in_loop():
+            return await coro
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return await asyncio.wrap_future(future)
+
+    def run(self, coro, timeout=None):
+        """Run `coro` on the background loop and block the calling thread for the result.
+
+        If the wait times out or is interrupted, the coroutine is cancelled rather
+        than left running on the loop.
+        """
+        if self.in_loop():
+            raise RuntimeError("BackgroundLoop.run() called from the background loop itself")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # No-op when the coroutine itself raised; otherwise cancels its task
+            future.cancel()
+            raise
+
+    def stop(self):
+        """Stop the loop and wait for its thread to exit."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or loop.is_closed():
+                return
+            loop.call_soon_threadsafe(loop.stop)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+
+# Shared by every service in this package
+background_loop = BackgroundLoop()
@@ -1,29 +1,77 @@
+import asyncio
 import json
 import os
 import re
+import time
 from datetime import datetime
-from fastmcp import Client
-from fastmcp.client.transports import StreamableHttpTransport, StdioTransport
-from together import Together
-from typing import List, Dict, Optional
-from mcp import ClientSession, StdioServerParameters, types
-from mcp.client.stdio import stdio_client
+from typing import Iterator, List, Dict, Optional
+from mcp import StdioServerParameters
+from services.outlook_session import OutlookSessionPool
+from services.slack_mcp import SlackMCPClient
+from services.user_directory import UserDirectory
+from services.summary_cache import SummaryCache, summary_cache_key
+from services.slack_store import SlackMessageStore
+from services.message_batch import MessageBatch
+from services.summarizer import ChunkedSummarizer, finish_plan
+from services.llm_client import llm_client
+from services import tracing
+from services.background_loop import background_loop
 
-# Create the transport with your MCP server URL
-server_url = "http://0.0.0.0:8000/mcp"
-transport = StreamableHttpTransport(server_url)
+# One persistent session to the Slack MCP server, shared by every request
+server_url = os.environ.get("SLACK_MCP_URL", "http://0.0.0.0:8000/mcp")
+slack_mcp = SlackMCPClient(server_url)
 
-# Initialize the client with the transport
-client = Client(transport=transport)
-together_client = Together(api_key=os.environ.get("TOGETHER_API_KEY"))
+async def _fetch_user_directory() -> Dict[str, dict]:
+    # Deactivated accounts are kept: they still sent much of the older history
+    result = await slack_mcp.call_tool("get_user_directory", {"include_deleted": True})
+    raw_response = json.loads(result[0].text).get('result') or {}
+    if not raw_response.get("ok"):
+        raise RuntimeError(f"get_user_directory failed: {raw_response.get('error', 'no result')}")
+    return raw_response["users"]
+
+# Slack user ID -> name, persisted under data/ and refreshed in the background
+user_directory = UserDirectory(
+    os.environ.get("SLACK_USER_DIRECTORY_PATH", os.path.join("data", "slack_users.json")),
+    _fetch_user_directory,
+    ttl=float(os.environ.get("SLACK_USER_DIRECTORY_TTL", str(24 * 3600))),
+)
+
+# Local copy of Slack history; only windows not synced yet are fetched
+slack_store = SlackMessageStore(
+    os.environ.get("SLACK_STORE_PATH", os.path.join("data", "slack_messages.db")),
+    edit_window=float(os.environ.get("SLACK_EDIT_WINDOW", "3600")),
+    thread_refresh_interval=float(os.environ.get("SLACK_THREAD_REFRESH_INTERVAL", "300")),
+    thread_active_window=float(os.environ.get("SLACK_THREAD_ACTIVE_WINDOW", str(7 * 24 * 3600))),
+)
+# Threads re-checked per request; the rest are picked up by later requests
+SLACK_THREAD_REFRESH_LIMIT = int(os.environ.get("SLACK_THREAD_REFRESH_LIMIT", "20"))
+
+# Summaries keyed on conversation digest, model and prompt; persisted under data/
+summary_cache = SummaryCache(
+    directory=os.environ.get("SUMMARY_CACHE_DIR", os.path.join("data", "summary_cache")),
+    max_entries=int(os.environ.get("SUMMARY_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("SUMMARY_CACHE_TTL", str(7 * 24 * 3600))),
+    max_disk_entries=int(os.environ.get("SUMMARY_CACHE_DISK_SIZE", os.environ.get("SUMMARY_CACHE_SIZE", "256"))),
+)
 
 # Create a client for Outlook MCP
-outlook_mcp_script = '../outlook-mcp/index.js'
+outlook_mcp_script = os.environ.get("OUTLOOK_MCP_SCRIPT", '../outlook-mcp/index.js')
 server_params = StdioServerParameters(
-    command="node",  # Executable
+    command=os.environ.get("OUTLOOK_MCP_COMMAND", "node"),  # Executable
     args=[outlook_mcp_script],  # Command line arguments
     env=None,  # Optional environment variables
 )
+# Fetch thread replies along with channel history
+SLACK_EXPAND_THREADS = os.environ.get("SLACK_EXPAND_THREADS", "1") != "0"
+
+# Maximum number of concurrent read-email calls per fetch
+OUTLOOK_READ_CONCURRENCY = int(os.environ.get("OUTLOOK_READ_CONCURRENCY", "8"))
+
+# Warm Outlook MCP sessions shared by every Outlook call
+outlook_pool = OutlookSessionPool(
+    server_params,
+    size=int(os.environ.get("OUTLOOK_MCP_POOL_SIZE", "2")),
+)
 
 def load_channels():
     try:
@@ -37,59 +85,132 @@ def save_channels(channels):
     with open('configs/channels.json', 'w') as f:
         json.dump({'channels': channels}, f, indent=4)
 
-async def fetch_slack_conversation(channel_id, start_dt: str, end_dt: str):
-    """Fetch messages from a Slack channel or thread."""
-    async with client:
-        # Fetch channel messages
+async def _fetch_history_window(channel_id, oldest: float, latest: float, expand_threads: bool = False) -> List[Dict]:
+    """Fetch one [oldest, latest] window of raw messages through the Slack MCP server.
+
+    With `expand_threads` the replies of every thread are included (flattened).
+    """
+    arguments = {
+        "channel_id": channel_id,
+        "oldest": f"{oldest:.6f}",
+        "latest": f"{latest:.6f}"
+    }
+    if expand_threads:
+        arguments.update({"expand_threads": True, "thread_format": "flat"})
+    result = await slack_mcp.call_tool("get_channel_history", arguments)
+    raw_response = json.loads(result[0].text).get('result') or {}
+    if not raw_response.get("ok"):
+        raise RuntimeError(f"get_channel_history failed: {raw_response.get('error', 'no result')}")
+    stats = raw_response.get("stats") or {}
+    if expand_threads and "threads" in stats:
+        print(f"[DEBUG] get_channel_history {channel_id}: {stats['api_calls']} history call(s), "
+              f"{stats['threads']['threads']} thread(s), {stats['threads']['api_calls']} replies call(s)")
+    return raw_response.get("messages", [])
+
+async def _refresh_thread(channel_id, thread_ts: str):
+    """Fetch one thread's replies through the Slack MCP server and store them."""
+    result = await slack_mcp.call_tool("get_thread_replies", {"channel_id": channel_id, "thread_ts": thread_ts})
+    raw_response = json.loads(result[0].text).get('result') or {}
+    if not raw_response.get("ok"):
+        raise RuntimeError(f"get_thread_replies failed: {raw_response.get('error', 'no result')}")
+    await asyncio.to_thread(slack_store.apply_thread, channel_id, thread_ts, raw_response.get("messages", []))
+
+async def _refresh_threads(channel_id, oldest: float, latest: float):
+    """Re-fetch replies of active threads whose parents lie before the windows just synced."""
+    stale = await asyncio.to_thread(slack_store.stale_threads, channel_id, oldest, latest,
+                                    limit=SLACK_THREAD_REFRESH_LIMIT)
+    if not stale:
+        return
+    with tracing.span("slack.refresh_threads", threads=len(stale)):
+        results = await asyncio.gather(*(_refresh_thread(channel_id, ts) for ts in stale), return_exceptions=True)
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed:
+        # Serve what is stored; those threads stay due for a re-check
+        print(f"[DEBUG] {len(failed)} of {len(stale)} thread refresh(es) failed for {channel_id}: {failed[0]}")
+
+def _sender_name(msg, names: Dict[str, str]) -> str:
+    # Get sender name from bot_profile or the user directory
+    if "bot_profile" in msg:
+        return msg["bot_profile"].get("name", "Unknown Bot")
+    if "user" in msg:
+        return names.get(msg["user"]) or f"User {msg['user']}"
+    return "Unknown"
+
+async def fetch_slack_conversation(channel_id, start_dt: str, end_dt: str,
+                                   expand_threads: bool = SLACK_EXPAND_THREADS) -> MessageBatch:
+    """Fetch messages from a Slack channel or thread, oldest first.
+
+    Only the parts of the window not already in the local message store are
+    requested from Slack; the conversation is then read from the store. With
+    `expand_threads`, each threaded message is followed by its replies (oldest
+    first, with `thread_ts` set), and threads with recent activity are
+    re-checked for new replies (see SlackMessageStore.stale_threads). Store
+    reads and writes run in a worker thread so the shared event loop keeps
+    serving other requests meanwhile.
+    """
+    oldest, latest = float(start_dt), float(end_dt)
+    with tracing.span("slack.plan_sync") as span:
+        windows = await asyncio.to_thread(slack_store.plan_sync, channel_id, oldest, latest, threads=expand_threads)
+        span.set(windows=len(windows))
+    for window_oldest, window_latest in windows:
         try:
-            result = await client.call_tool(
-                "get_channel_history",
-                {
-                    "channel_id": channel_id,
-                    "oldest": start_dt,
-                    "latest": end_dt
-                }
-            )
+            with tracing.span("slack.fetch_window", oldest=window_oldest, latest=window_latest) as span:
+                messages = await _fetch_history_window(channel_id, window_oldest, window_latest, expand_threads)
+                span.set(messages=len(messages))
         except Exception as e:
-            print(e)
-        
-        # Parse the raw response
-        raw_response = json.loads(result[0].text).get('result', {})
-        
-        # Extract and format conversation
-        conversation = []
-        if raw_response.get("ok") and "messages" in raw_response:
-            for msg in raw_response["messages"]:
-                # Skip system messages and channel events
-                if msg.get("subtype") in ["channel_name", "channel_join"]:
-                    continue
-                    
-                # Get sender name from bot_profile or user
-                sender = "Unknown"
-                if "bot_profile" in msg:
-                    sender = msg["bot_profile"].get("name", "Unknown Bot")
-                elif "user" in msg:
-                    sender = f"User {msg['user']}"
-                
-                # Get message text
-                text = msg.get("text", "")
-                
-                # Convert timestamp to readable format
-                timestamp = datetime.fromtimestamp(float(msg["ts"]))
-                formatted_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Add formatted message to conversation
-                conversation.append({
-                    "sender": sender,
-                    "text": text,
-                    "timestamp": formatted_time
-                })
-        
-        return conversation
-
-async def summarize_conversation(conversation, model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"):
-    """Summarize the conversation using TogetherAI and save to file."""
-    system_prompt = """
+            # Serve what is stored; the watermark is not advanced for this window
+            print(f"[DEBUG] Exception in get_channel_history: {e}")
+            continue
+        with tracing.span("slack.store_window"):
+            await asyncio.to_thread(
+                slack_store.apply_window, channel_id, window_oldest, window_latest, messages, threads=expand_threads
+            )
+    print(f"[DEBUG] Slack sync for {channel_id}: {len(windows)} window(s) fetched")
+    if expand_threads:
+        await _refresh_threads(channel_id, oldest, latest)
+
+    with tracing.span("slack.read_store") as span:
+        # Skip system messages and channel events
+        messages = [
+            msg for msg in await asyncio.to_thread(slack_store.messages_in_range, channel_id, oldest, latest)
+            if msg.get("subtype") not in ["channel_name", "channel_join"]
+        ]
+        replies = {}
+        if expand_threads:
+            replies = await asyncio.to_thread(
+                slack_store.replies_for, channel_id, [msg["ts"] for msg in messages if msg.get("reply_count", 0) > 0]
+            )
+        span.set(messages=len(messages), threads=len(replies))
+
+    try:
+        with tracing.span("slack.user_directory"):
+            names = await user_directory.names()
+    except Exception as e:
+        print(f"[DEBUG] User directory unavailable: {e}")
+        names = {}
+
+    with tracing.span("slack.build_conversation") as span:
+        # Extract the conversation in reading order (the store returns newest first)
+        conversation = MessageBatch()
+        unknown_users = set()
+        for msg in reversed(messages):
+            for item in [msg] + replies.get(msg["ts"], []):
+                if "user" in item and "bot_profile" not in item and item["user"] not in names:
+                    unknown_users.add(item["user"])
+                conversation.append(
+                    float(item["ts"]),
+                    _sender_name(item, names),
+                    user_directory.resolve_mentions(item.get("text", ""), names),
+                    float(msg["ts"]) if item is not msg else None
+                )
+        span.set(messages=len(conversation))
+    user_directory.report_missing(unknown_users)
+    
+    return conversation
+
+DEFAULT_SUMMARY_MODEL = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
+
+SUMMARY_SYSTEM_PROMPT = """
     Summary instructions:
     - You are a helpful assistant that summarizes conversations in chat messages.
     - You will be given a conversation and you will need to summarize it very concisely.
@@ -112,143 +233,240 @@ async def summarize_conversation(conversation, model="meta-llama/Llama-3.3-70B-I
     * ...
     
     """
-    try:
-        print(f"[DEBUG] System prompt: {system_prompt}")
-        print(f"[DEBUG] Conversation: {conversation}")
-        response = together_client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": conversation}
-            ],
-        )
-    except Exception as e:
-        print(e)
-    summary = response.choices[0].message.content
+
+REDUCE_SYSTEM_PROMPT = """
+    Summary instructions:
+    - You are a helpful assistant that merges partial summaries of one long conversation.
+    - You will be given summaries of consecutive parts of the conversation.
+    - Combine them into a single concise summary, removing duplicates and keeping every distinct key point, decision and task.
+    - Present the summary in a nice Markdown format.
+    - The format of the output should be:
+    **Key Points**
+    * key point 1
+    * key point 2
+    * ...
+
+    **Decisions Made**
+    * decision 1
+    * decision 2
+    * ...
+
+    **Tasks Assigned**
+    * task assignment 1
+    * task assignment 2
+    * ...
     
-    return summary 
+    """
 
-async def fetch_outlook_emails(folder_name: str, number_of_recent_emails) -> List[Dict]:
+async def _complete(system_prompt: str, content: str, model: str) -> str:
+    """Run one Together chat completion on the shared async LLM client."""
+    with tracing.span("llm.complete", model=model, prompt_chars=len(system_prompt) + len(content)):
+        return await llm_client.complete(system_prompt, content, model)
+
+# Splits large conversations by token budget and summarizes the chunks in parallel
+summarizer = ChunkedSummarizer(
+    _complete,
+    chunk_tokens=int(os.environ.get("SUMMARY_CHUNK_TOKENS", "6000")),
+    fan_in=int(os.environ.get("SUMMARY_FAN_IN", "8")),
+    concurrency=int(os.environ.get("SUMMARY_CONCURRENCY", "4")),
+)
+
+async def summarize_conversation_detailed(conversation, model=DEFAULT_SUMMARY_MODEL) -> Dict:
+    """Summarize a conversation (string or list of messages) and report how it was produced.
+
+    Returns a dict with `summary`, `cached`, `chunks` and per-stage `timings`.
+    The summary cache is read and written in a worker thread, off the event loop.
+    Cancelling the calling task (as the app does for views that exceed
+    ASYNC_VIEW_TIMEOUT) cancels the in-flight LLM calls, including every map
+    and reduce chunk; a client disconnect alone does not.
+    """
+    started = time.perf_counter()
+    system_prompt = SUMMARY_SYSTEM_PROMPT
+    with tracing.span("summary_cache.get") as span:
+        cache_key = summary_cache_key(conversation, model, system_prompt)
+        cached = await asyncio.to_thread(summary_cache.get, cache_key)
+        span.set(hit=cached is not None)
+    if cached is not None:
+        print(f"[DEBUG] Summary cache hit {cache_key[:12]}")
+        return {"summary": cached, "cached": True, "chunks": 0, "timings": {"total": time.perf_counter() - started}}
+    with tracing.span("summarize", model=model) as span:
+        result = await summarizer.summarize(conversation, system_prompt, REDUCE_SYSTEM_PROMPT, model)
+        span.set(chunks=result["chunks"], levels=result["levels"])
+    print(f"[DEBUG] Summarized {result['chunks']} chunk(s) in {result['timings']['total']:.2f}s: {result['timings']}")
+    await asyncio.to_thread(summary_cache.set, cache_key, result["summary"], model=model)
+    result["cached"] = False
+    return result
+
+async def summarize_conversation(conversation, model=DEFAULT_SUMMARY_MODEL):
+    """Summarize the conversation using TogetherAI, reusing cached summaries of identical windows."""
+    result = await summarize_conversation_detailed(conversation, model)
+    return result["summary"]
+
+def stream_summary(conversation, model=DEFAULT_SUMMARY_MODEL, timeout: Optional[float] = None) -> Iterator[Dict]:
+    """Summarize a conversation, yielding tokens of the final LLM call as they arrive.
+
+    Yields `{"type": "token", "text": ...}` events followed by one
+    `{"type": "done", "summary": ..., "cached": ..., "chunks": ..., "timings": ...}`.
+    Large conversations run their map/reduce stages first; only the last call streams.
+    Those stages are cancelled, and concurrent.futures.TimeoutError raised, if they
+    take longer than `timeout` seconds.
+    """
+    started = time.perf_counter()
+    system_prompt = SUMMARY_SYSTEM_PROMPT
+    with tracing.span("summary_cache.get") as span:
+        cache_key = summary_cache_key(conversation, model, system_prompt)
+        cached = summary_cache.get(cache_key)
+        span.set(hit=cached is not None)
+    if cached is not None:
+        yield {"type": "done", "summary": cached, "cached": True, "chunks": 0,
+               "timings": {"total": time.perf_counter() - started}}
+        return
+    with tracing.span("summarize.prepare", model=model) as span:
+        plan = background_loop.run(summarizer.prepare(conversation, system_prompt, REDUCE_SYSTEM_PROMPT, model), timeout)
+        span.set(chunks=plan["chunks"], levels=plan["levels"])
+    stage_started = time.perf_counter()
+    parts = []
+    with tracing.span("llm.stream", model=model, prompt_chars=len(plan["system"]) + len(plan["content"])) as span:
+        for delta in llm_client.stream_sync(plan["system"], plan["content"], model):
+            if not parts:
+                plan["timings"]["first_token"] = time.perf_counter() - plan["started"]
+                span.set(first_token_ms=round(plan["timings"]["first_token"] * 1000, 2))
+            parts.append(delta)
+            yield {"type": "token", "text": delta}
+    result = finish_plan(plan, "".join(parts), stage_started)
+    summary_cache.set(cache_key, result["summary"], model=model)
+    yield {"type": "done", "cached": False, **result}
+
+def get_summary_cache_stats() -> dict:
+    """Hit/miss counters for the summary cache."""
+    return summary_cache.stats()
+
+def _parse_email(email_id: str, email_content: str) -> Optional[Dict]:
+    """Parse the plain text `read-email` response into an email dict."""
+    if not email_content:
+        return None
+    lines = email_content.splitlines()
+    headers = {}
+    body_start_index = 0
+    for i, line in enumerate(lines):
+        if not line.strip():
+            body_start_index = i + 1
+            break
+        if ': ' in line:
+            key, value = line.split(': ', 1)
+            headers[key.lower()] = value.strip()
+        else:
+            body_start_index = i
+            break
+    else:
+        body_start_index = len(lines)
+    body = "\n".join(lines[body_start_index:]).strip()
+    sender_full = headers.get("from", "")
+    sender_name = sender_full
+    sender_address = ""
+    match = re.search(r'(.*) \((.*)\)', sender_full)
+    if match:
+        sender_name = match.group(1).strip()
+        sender_address = match.group(2).strip()
+    elif sender_full:
+        sender_address = sender_full
+    return {
+        "id": email_id,
+        "sender": sender_name,
+        "address": sender_address,
+        "subject": headers.get("subject", "No Subject"),
+        "body": body,
+        "contentType": "Text",
+        "receivedDateTime": headers.get("date")
+    }
+
+async def _read_email(email_id: str, semaphore: asyncio.Semaphore) -> Optional[Dict]:
+    """Read and parse one email; returns None if it could not be read."""
+    async with semaphore:
+        try:
+            with tracing.span("outlook.read_email", id=email_id):
+                read_result = await outlook_pool.call_tool('read-email', arguments={"id": email_id})
+                return _parse_email(email_id, read_result.content[0].text)
+        except Exception as e:
+            print(f"[DEBUG] Exception in read-email {email_id}: {e}")
+            return None
+
+async def fetch_outlook_emails(folder_name: str, number_of_recent_emails,
+                               max_concurrency: int = OUTLOOK_READ_CONCURRENCY) -> List[Dict]:
     """
     Fetch emails from a specified Outlook folder.
+
+    `read-email` calls run concurrently (at most `max_concurrency` at a time) and the
+    result keeps the order returned by `list-emails`. Emails that fail to load are
+    skipped instead of truncating the list.
     """
-    # async with client:
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            emails = []
-            # List recent emails
-            try:
-                tool_args = {
-                    "folder": folder_name,
-                    "count": number_of_recent_emails
-                }
-                list_result = await session.call_tool('list-emails', arguments=tool_args)
-                print(list_result)
-            except Exception as e:
-                print(f"[DEBUG] Exception in list-emails: {e}")
-                return emails
-            # Extract email IDs from the plain text response
-            try:
-                list_response_text = list_result.content[0].text
-                email_ids = [line.split("ID: ")[1] for line in list_response_text.splitlines() if line.startswith("ID: ")]
-            except Exception as e:
-                return print(e)
-            
-            if email_ids:
-                for email_id in email_ids:
-                    print(email_id)
-                    try:
-                        tool_args = {
-                            "id": email_id
-                        }
-                        read_result = await session.call_tool('read-email', arguments=tool_args)
-                        print(read_result)
-                    except Exception as e:
-                        print(f"[DEBUG] Exception in read-email: {e}")
-                        return emails
-                    
-                    email_content = read_result.content[0].text
-                    if email_content:
-                        lines = email_content.splitlines()
-                        headers = {}
-                        body_start_index = 0
-                        for i, line in enumerate(lines):
-                            if not line.strip():
-                                body_start_index = i + 1
-                                break
-                            if ': ' in line:
-                                key, value = line.split(': ', 1)
-                                headers[key.lower()] = value.strip()
-                            else:
-                                body_start_index = i
-                                break
-                        else:
-                            body_start_index = len(lines)
-                        body = "\n".join(lines[body_start_index:]).strip()
-                        sender_full = headers.get("from", "")
-                        sender_name = sender_full
-                        sender_address = ""
-                        match = re.search(r'(.*) \((.*)\)', sender_full)
-                        if match:
-                            sender_name = match.group(1).strip()
-                            sender_address = match.group(2).strip()
-                        elif sender_full:
-                            sender_address = sender_full
-                        emails.append({
-                            "sender": sender_name,
-                            "address": sender_address,
-                            "subject": headers.get("subject", "No Subject"),
-                            "body": body,
-                            "contentType": "Text",
-                            "receivedDateTime": headers.get("date")
-                        })
-            print("[DEBUG] Exiting async with outlook_client block")
-            return emails 
+    emails = []
+    # List recent emails
+    try:
+        tool_args = {
+            "folder": folder_name,
+            "count": number_of_recent_emails
+        }
+        with tracing.span("outlook.list_emails", folder=folder_name):
+            list_result = await outlook_pool.call_tool('list-emails', arguments=tool_args)
+    except Exception as e:
+        print(f"[DEBUG] Exception in list-emails: {e}")
+        return emails
+    # Extract email IDs from the plain text response
+    try:
+        list_response_text = list_result.content[0].text
+        email_ids = [line.split("ID: ")[1] for line in list_response_text.splitlines() if line.startswith("ID: ")]
+    except Exception as e:
+        print(f"[DEBUG] Could not parse list-emails response: {e}")
+        return emails
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    results = await asyncio.gather(*(_read_email(email_id, semaphore) for email_id in email_ids))
+    emails = [email for email in results if email is not None]
+    if len(emails) < len(email_ids):
+        print(f"[DEBUG] Read {len(emails)} of {len(email_ids)} emails from '{folder_name}'")
+    return emails
 
 async def check_outlook_auth_status() -> bool:
     """
     Check authentication status with the Outlook MCP server.
     Returns True if authenticated, otherwise False.
     """
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            try:
-                result = await session.call_tool('check-auth-status')
-                # The result is expected to be in result.content[0].text
-                status_text = result.content[0].text.strip()
-                return status_text == "Authenticated and ready"
-            except Exception as e:
-                print(f"[DEBUG] Exception in check-auth-status: {e}")
-                return False 
+    try:
+        result = await outlook_pool.call_tool('check-auth-status')
+        # The result is expected to be in result.content[0].text
+        status_text = result.content[0].text.strip()
+        return status_text == "Authenticated and ready"
+    except Exception as e:
+        print(f"[DEBUG] Exception in check-auth-status: {e}")
+        return False
 
 async def authenticate_outlook() -> str:
     """
     Call the 'authenticate' tool from the Outlook MCP server and return the authentication link.
     """
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            try:
-                await session.call_tool('authenticate')
-            except Exception as e:
-                print(f"[DEBUG] Exception in authenticate: {e}")
-            return "http://localhost:3333/auth?client_id=" 
-        
+    try:
+        await outlook_pool.call_tool('authenticate')
+    except Exception as e:
+        print(f"[DEBUG] Exception in authenticate: {e}")
+    return "http://localhost:3333/auth?client_id="
+
+
 async def send_outlook_email(to_email, subject, message):
 
-    # Connect to Outlook MCP server and send email
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize() 
-            # Call the send-email tool
-            result = await session.call_tool('send-email', arguments={
-                'to': to_email,
-                'subject': subject,
-                'body': message,
-                'importance': 'normal',
-                'saveToSentItems': True
-            })
-
-            return result
\ No newline at end of file
+    # Call the send-email tool on a pooled Outlook MCP session
+    result = await outlook_pool.call_tool('send-email', arguments={
+        'to': to_email,
+        'subject': subject,
+        'body': message,
+        'importance': 'normal',
+        'saveToSentItems': True
+    })
+
+    return result
+
+def shutdown_services():
+    """Close the Slack and Outlook MCP sessions and the shared LLM connection pool."""
+    slack_mcp.shutdown()
+    outlook_pool.shutdown()
+    llm_client.close()
\ No newline at end of file
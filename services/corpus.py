@@ -0,0 +1,144 @@
+"""
+The searchable corpus: Slack messages, Outlook emails and saved summaries.
+
+`collect_corpus` pulls every configured channel through the same fetchers the
+summarize flow uses, and `reindex_corpus` syncs the result into the RAG index and
+the BM25 keyword index so `/api/ask` and `/api/search` work over it offline.
+"""
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from services.channel_service import fetch_slack_conversation, fetch_outlook_emails
+from services.rag_service import RAGService
+from services.search_index import BM25Index, HybridSearcher
+from services.background_loop import background_loop
+
+SUMMARY_GLOB = os.path.join("outputs", "summary_*.md")
+SLACK_DAYS = float(os.environ.get("CORPUS_SLACK_DAYS", "30"))
+OUTLOOK_COUNT = int(os.environ.get("CORPUS_OUTLOOK_COUNT", "50"))
+
+INDEX_DIR = os.environ.get("CORPUS_INDEX_DIR", os.path.join("data", "rag_corpus"))
+
+_rag_service = None
+_keyword_index = None
+_searcher = None
+# Guards the lazy singletons so concurrent first requests build each one once
+_lock = threading.Lock()
+
+
+def get_corpus_rag() -> RAGService:
+    """Process-wide RAG service over the corpus; the ANN backend is chosen by RAG_INDEX_TYPE."""
+    global _rag_service
+    if _rag_service is None:
+        with _lock:
+            if _rag_service is None:
+                _rag_service = RAGService(
+                    INDEX_DIR,
+                    index_type=os.environ.get("RAG_INDEX_TYPE", "hnsw"),
+                    ann_min_size=int(os.environ.get("RAG_ANN_MIN_SIZE", "2000")),
+                    nprobe=int(os.environ.get("RAG_NPROBE", "16")),
+                    ef_search=int(os.environ.get("RAG_EF_SEARCH", "64")),
+                    embedding_batch_size=int(os.environ.get("EMBEDDING_BATCH_SIZE", "64")),
+                    multiprocess_threshold=int(os.environ.get("EMBEDDING_MULTIPROCESS_THRESHOLD", "5000")),
+                )
+    return _rag_service
+
+
+def loaded_corpus_rag() -> Optional[RAGService]:
+    """The RAG service if a request has loaded it already, else None (never loads it)."""
+    return _rag_service
+
+
+def get_keyword_index() -> BM25Index:
+    global _keyword_index
+    if _keyword_index is None:
+        with _lock:
+            if _keyword_index is None:
+                _keyword_index = BM25Index(os.path.join(INDEX_DIR, "keywords.pkl"))
+    return _keyword_index
+
+
+def get_corpus_search() -> HybridSearcher:
+    """Hybrid BM25 + vector search over the corpus."""
+    global _searcher
+    if _searcher is None:
+        # Built outside the lock, which each of them takes itself
+        rag, keywords = get_corpus_rag(), get_keyword_index()
+        with _lock:
+            if _searcher is None:
+                _searcher = HybridSearcher(rag, keywords)
+    return _searcher
+
+
+def _email_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parse an Outlook receivedDateTime (ISO 8601 or RFC 2822) into a unix timestamp."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+async def collect_corpus(channels) -> Tuple[Dict[str, str], Dict[str, dict]]:
+    """Return (documents, metadata) keyed by a stable document key."""
+    documents, metadata = {}, {}
+    now = time.time()
+    for channel in channels:
+        if channel.get("type") == "slack" and channel.get("slack_channel_id"):
+            slack_channel_id = channel["slack_channel_id"]
+            conversation = await fetch_slack_conversation(
+                slack_channel_id, str(int(now - SLACK_DAYS * 86400)), str(int(now))
+            )
+            for msg in conversation:
+                key = f"slack:{slack_channel_id}:{msg.ts_str}"
+                documents[key] = msg.text
+                metadata[key] = {
+                    "source": "slack",
+                    "channel": channel["name"],
+                    "sender": msg.sender,
+                    "timestamp": msg.ts,
+                }
+        elif channel.get("type") == "outlook" and channel.get("outlook_folder"):
+            folder = channel["outlook_folder"]
+            for email in await fetch_outlook_emails(folder, OUTLOOK_COUNT):
+                key = f"outlook:{folder}:{email['id']}"
+                documents[key] = f"Subject: {email['subject']}\n{email['body']}"
+                metadata[key] = {
+                    "source": "outlook",
+                    "channel": channel["name"],
+                    "sender": email["sender"] or email["address"],
+                    "date": email["receivedDateTime"],
+                    "timestamp": _email_timestamp(email["receivedDateTime"]),
+                }
+    for path in sorted(glob.glob(SUMMARY_GLOB)):
+        key = f"summary:{os.path.basename(path)}"
+        with open(path, "r") as f:
+            documents[key] = f.read()
+        metadata[key] = {"source": "summary", "timestamp": os.path.getmtime(path)}
+    return documents, metadata
+
+
+def reindex_corpus(channels, on_progress=None) -> dict:
+    """Fetch the corpus and sync it into the RAG and keyword indexes (blocking; run it as a background job)."""
+    if on_progress:
+        on_progress(0, 3)
+    documents, metadata = background_loop.run(collect_corpus(channels))
+    if on_progress:
+        on_progress(1, 3)
+    stats = get_corpus_rag().sync_documents(documents, metadata)
+    if on_progress:
+        on_progress(2, 3)
+    stats["keywords"] = get_keyword_index().sync(documents, metadata)
+    if on_progress:
+        on_progress(3, 3)
+    return stats
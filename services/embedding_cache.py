@@ -0,0 +1,167 @@
+"""
+On-disk embedding cache and batched embedding pipeline.
+
+Vectors are cached by the SHA-256 of the text in a memory-mapped float32 file
+(`vectors.f32`, one row per text) with the digests in a parallel `hashes.bin`.
+The pipeline de-duplicates its input, looks every text up in the cache and only
+encodes what is missing, in batches of `batch_size`. Large backlogs are spread
+across CPU cores with sentence-transformers' multi-process pool.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, List
+
+import numpy as np
+
+DIGEST_SIZE = 32
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, directory: str, model_name: str, initial_capacity: int = 1024):
+        self.directory = directory
+        self.model_name = model_name
+        self.initial_capacity = initial_capacity
+        self.dimension = None
+        self.rows = 0
+        self._vectors = None
+        self._rows_by_digest = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _hashes_path(self):
+        return os.path.join(self.directory, "hashes.bin")
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r") as f:
+            meta = json.load(f)
+        if meta.get("model") != self.model_name:
+            print(f"[DEBUG] Embedding cache at {self.directory} belongs to {meta.get('model')}, starting over")
+            for path in (self._meta_path, self._vectors_path, self._hashes_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        self.dimension = meta["dimension"]
+        self.rows = meta["rows"]
+        capacity = os.path.getsize(self._vectors_path) // (4 * self.dimension)
+        self._vectors = np.memmap(self._vectors_path, dtype="float32", mode="r+", shape=(capacity, self.dimension))
+        with open(self._hashes_path, "rb") as f:
+            digests = f.read(self.rows * DIGEST_SIZE)
+        self._rows_by_digest = {
+            digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE]: i for i in range(len(digests) // DIGEST_SIZE)
+        }
+        self.rows = len(self._rows_by_digest)
+
+    def _ensure_capacity(self, rows: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(self.initial_capacity, capacity)
+        while new_capacity < rows:
+            new_capacity *= 2
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dimension * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype="float32", mode="r+", shape=(new_capacity, self.dimension))
+
+    def get_many(self, digests: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return cached vectors for the digests that are present."""
+        with self._lock:
+            if self._vectors is None:
+                return {}
+            return {
+                digest: np.array(self._vectors[row])
+                for digest in digests
+                if (row := self._rows_by_digest.get(digest)) is not None
+            }
+
+    def put_many(self, digests: List[bytes], vectors: np.ndarray):
+        with self._lock:
+            new = [(digest, vector) for digest, vector in zip(digests, vectors) if digest not in self._rows_by_digest]
+            if not new:
+                return
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+            start = self.rows
+            self._ensure_capacity(start + len(new))
+            self._vectors[start:start + len(new)] = np.stack([vector for _, vector in new])
+            self._vectors.flush()
+            # Vectors first, then digests, then the row count: a crash never exposes a half-written row
+            with open(self._hashes_path, "ab") as f:
+                f.seek(start * DIGEST_SIZE)
+                f.truncate(start * DIGEST_SIZE)
+                f.write(b"".join(digest for digest, _ in new))
+            for offset, (digest, _) in enumerate(new):
+                self._rows_by_digest[digest] = start + offset
+            self.rows = start + len(new)
+            with open(self._meta_path + ".tmp", "w") as f:
+                json.dump({"model": self.model_name, "dimension": self.dimension, "rows": self.rows}, f)
+            os.replace(self._meta_path + ".tmp", self._meta_path)
+
+
+class EmbeddingPipeline:
+    def __init__(self, get_model: Callable, cache: EmbeddingCache, batch_size: int = 64,
+                 multiprocess_threshold: int = 5000):
+        self.get_model = get_model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.multiprocess_threshold = multiprocess_threshold
+        self.encoded = 0
+        self.cache_hits = 0
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        model = self.get_model()
+        if len(texts) >= self.multiprocess_threshold:
+            pool = model.start_multi_process_pool()
+            try:
+                vectors = model.encode_multi_process(texts, pool, batch_size=self.batch_size)
+            finally:
+                model.stop_multi_process_pool(pool)
+        else:
+            vectors = model.encode(texts, batch_size=self.batch_size)
+        vectors = np.asarray(vectors, dtype="float32")
+        # Normalize embeddings for cosine similarity
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return normalized float32 embeddings for `texts`, encoding only uncached content."""
+        if not texts:
+            return np.empty((0, self.cache.dimension or 0), dtype="float32")
+        digests = [text_digest(text) for text in texts]
+        found = self.cache.get_many(list(set(digests)))
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in found and digest not in missing:
+                missing[digest] = text
+        self.cache_hits += len(texts) - len(missing)
+        if missing:
+            missing_digests = list(missing)
+            # A large backlog goes to the multi-process pool in one call; otherwise stream batches
+            step = len(missing_digests) if len(missing_digests) >= self.multiprocess_threshold else self.batch_size * 16
+            for start in range(0, len(missing_digests), step):
+                batch = missing_digests[start:start + step]
+                vectors = self._encode([missing[digest] for digest in batch])
+                self.cache.put_many(batch, vectors)
+                found.update(zip(batch, vectors))
+                self.encoded += len(batch)
+        return np.stack([found[digest] for digest in digests]).astype("float32")
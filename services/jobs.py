@@ -0,0 +1,126 @@
+"""
+In-process background job queue.
+
+Long-running work (e.g. regenerating action items) runs on a small thread pool
+instead of blocking a request. Submitting a job of a kind that is already queued
+or running returns the existing job, so repeated clicks do not start overlapping
+runs. Job state is kept in memory for polling.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def set_progress(self, done: int, total: int, message: str = ""):
+        self.done, self.total = done, total
+        if message:
+            self.message = message
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    def __init__(self, max_workers: int = 1, history: int = 50):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nosyworker-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._history = history
+        self._listeners = []
+
+    def add_listener(self, fn: Callable[[Job], None]):
+        """Call `fn(job)` on the worker thread whenever a job finishes (succeeded or failed)."""
+        self._listeners.append(fn)
+        return fn
+
+    def submit(self, kind: str, fn: Callable[[Job], object]) -> Tuple[Job, bool]:
+        """Queue `fn(job)` unless a job of the same kind is active.
+
+        Returns (job, created); `created` is False when an active job was reused.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and job.active:
+                    return job, False
+            job = Job(kind)
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job, fn)
+        return job, True
+
+    def _run(self, job: Job, fn: Callable[[Job], object]):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job)
+            job.status = SUCCEEDED
+        except Exception as e:
+            print(f"[DEBUG] Job {job.kind} {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            for listener in self._listeners:
+                try:
+                    listener(job)
+                except Exception as e:
+                    print(f"[DEBUG] Job listener failed for {job.kind} {job.id}: {e}")
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(self._jobs) - self._history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def depth(self) -> dict:
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+        return {"queued": queued, "running": running}
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# Shared by the Flask app
+job_queue = JobQueue(max_workers=2)
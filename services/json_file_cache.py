@@ -0,0 +1,85 @@
+"""
+In-memory cache of a JSON file and the HTTP response built from it.
+
+The file is parsed once and the response body serialized once per version of
+the file; requests in between are served from memory. The file is re-checked
+with a single `os.stat` at most every `check_interval` seconds and reloaded when
+its inode, mtime or size changed (the part2 writers replace files atomically,
+so a rewrite shows up as a new inode). `invalidate()` forces the next request
+to look again, e.g. when a refresh job finishes. Bodies are serialized with
+sorted keys, like Flask's jsonify; pass `serialize` to match it byte for byte.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class CachedJson:
+    __slots__ = ("data", "body", "etag", "signature")
+
+    def __init__(self, data: Any, body: bytes, etag: str, signature: tuple):
+        self.data = data
+        self.body = body
+        self.etag = etag
+        self.signature = signature
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, sort_keys=True).encode("utf-8")
+
+
+class JsonFileCache:
+    def __init__(self, path: str, render: Callable[[Any], Any] = lambda data: data, check_interval: float = 2.0,
+                 serialize: Callable[[Any], bytes] = _dumps):
+        self.path = path
+        self.render = render
+        self.serialize = serialize
+        self.check_interval = check_interval
+        self._entry: Optional[CachedJson] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def get(self) -> Optional[CachedJson]:
+        """The current document, or None if the file does not exist.
+
+        Raises ValueError when the file is not valid JSON.
+        """
+        entry = self._entry
+        if time.monotonic() - self._checked_at < self.check_interval:
+            self.hits += 1
+            return entry
+        with self._lock:
+            # Another request may have re-checked while this one waited
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return self._entry
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._entry = None
+                return None
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._entry is None or self._entry.signature != signature:
+                self._entry = self._load(signature)
+            else:
+                self.hits += 1
+            return self._entry
+
+    def _load(self, signature: tuple) -> CachedJson:
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw)
+        body = self.serialize(self.render(data))
+        self.loads += 1
+        return CachedJson(data, body, hashlib.sha1(body).hexdigest(), signature)
+
+    def stats(self) -> dict:
+        return {"loads": self.loads, "hits": self.hits, "cached": self._entry is not None}
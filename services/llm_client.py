@@ -0,0 +1,180 @@
+"""
+Async client for Together's OpenAI-compatible chat completions API.
+
+One keep-alive aiohttp connection pool lives on the shared background loop, so
+every caller (Flask views, part1 scripts, the part2 action generator) reuses the
+same connections whatever event loop it runs on. Calls have a per-call timeout,
+and cancelling the awaiting coroutine cancels the HTTP request.
+"""
+import asyncio
+import json
+import os
+import queue
+import time
+from typing import Dict, Iterator, List, Optional
+
+import aiohttp
+
+from services.background_loop import background_loop
+from services.metrics import record_llm_call
+
+DEFAULT_BASE_URL = "https://api.together.xyz/v1"
+
+
+class LLMError(RuntimeError):
+    """Raised when the completion API returns an error response."""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"LLM API error {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AsyncLLMClient:
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = 120.0, max_connections: int = 32):
+        self._api_key = api_key
+        self.base_url = (base_url or os.environ.get("TOGETHER_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._session = None
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._api_key or os.environ.get("TOGETHER_API_KEY")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Only ever called on the background loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    async def _post_chat(self, payload: dict, timeout: float) -> dict:
+        session = self._get_session()
+        async with session.post(
+            f"{self.base_url}/chat/completions",
+            json=payload,
+            headers=self._headers(),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            if response.status >= 400:
+                raise LLMError(response.status, await response.text(), _retry_after(response))
+            return await response.json()
+
+    async def chat(self, messages: List[Dict], model: str, timeout: Optional[float] = None, **params) -> dict:
+        """Create a chat completion and return the raw response body."""
+        payload = {"model": model, "messages": messages, **params}
+        started = time.perf_counter()
+        try:
+            response = await background_loop.call(self._post_chat(payload, timeout or self.timeout))
+        except Exception:
+            record_llm_call(model, time.perf_counter() - started, ok=False)
+            raise
+        record_llm_call(model, time.perf_counter() - started, ok=True, usage=response.get("usage"))
+        return response
+
+    async def complete(self, system_prompt: Optional[str], content: str, model: str,
+                       timeout: Optional[float] = None, **params) -> str:
+        """Return the assistant text for a system prompt plus one user message."""
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "user", "content": content})
+        response = await self.chat(messages, model, timeout=timeout, **params)
+        return response["choices"][0]["message"]["content"]
+
+    def complete_sync(self, system_prompt: Optional[str], content: str, model: str,
+                      timeout: Optional[float] = None, **params) -> str:
+        """Blocking variant of `complete` for synchronous callers."""
+        return background_loop.run(self.complete(system_prompt, content, model, timeout=timeout, **params))
+
+    async def _stream_chat(self, payload: dict, timeout: float, on_delta, usage: Optional[dict] = None):
+        session = self._get_session()
+        # Bound the wait for each chunk rather than the whole generation
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        async with session.post(
+            f"{self.base_url}/chat/completions",
+            json={**payload, "stream": True},
+            headers=self._headers(),
+            timeout=client_timeout,
+        ) as response:
+            if response.status >= 400:
+                raise LLMError(response.status, await response.text(), _retry_after(response))
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if usage is not None and chunk.get("usage"):
+                    usage.update(chunk["usage"])
+                choices = chunk.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    on_delta(delta)
+
+    def stream_sync(self, system_prompt: Optional[str], content: str, model: str,
+                    timeout: Optional[float] = None, **params) -> Iterator[str]:
+        """Yield completion text deltas as they arrive, for synchronous callers.
+
+        Closing the generator early (e.g. the HTTP client went away) cancels the request.
+        """
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "user", "content": content})
+        payload = {"model": model, "messages": messages, **params}
+        deltas = queue.Queue()
+        done = object()
+        usage = {}
+
+        async def pump():
+            try:
+                await self._stream_chat(payload, timeout or self.timeout, deltas.put, usage)
+                deltas.put(done)
+            except BaseException as e:
+                deltas.put(e)
+                raise
+
+        started = time.perf_counter()
+        ok = False
+        future = asyncio.run_coroutine_threadsafe(pump(), background_loop.loop)
+        try:
+            while True:
+                item = deltas.get()
+                if item is done:
+                    ok = True
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+            record_llm_call(model, time.perf_counter() - started, ok=ok, usage=usage)
+
+    async def _close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def close(self):
+        """Close the shared connection pool."""
+        if self._session is None:
+            return
+        try:
+            background_loop.run(self._close(), 5)
+        except Exception as e:
+            print(f"[DEBUG] Error closing LLM client: {e}")
+
+
+def _retry_after(response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# Shared by channel_service, part1 and part2
+llm_client = AsyncLLMClient(timeout=float(os.environ.get("LLM_TIMEOUT", "120")))
@@ -0,0 +1,141 @@
+"""
+Compact, columnar container for fetched chat messages.
+
+A `MessageBatch` keeps one row per message in parallel arrays: float timestamps,
+interned sender ids and the parent timestamp of thread replies, with every
+message text stored in one string buffer addressed by offsets. That is a few
+dozen bytes of overhead per message instead of a dict with five string values,
+and filtering by time or sender scans arrays of numbers. `prompt_lines()`
+renders the batch in a terse, chronological form for the LLM prompt.
+"""
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class Message:
+    """Read-only view of one row of a `MessageBatch`."""
+    __slots__ = ("ts", "sender", "text", "thread_ts")
+
+    def __init__(self, ts: float, sender: str, text: str, thread_ts: Optional[float] = None):
+        self.ts = ts
+        self.sender = sender
+        self.text = text
+        self.thread_ts = thread_ts
+
+    @property
+    def ts_str(self) -> str:
+        """The Slack-style ts string ("1700000000.123456")."""
+        return f"{self.ts:.6f}"
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.ts).strftime("%Y-%m-%d %H:%M:%S")
+
+    def to_dict(self) -> Dict:
+        item = {"sender": self.sender, "text": self.text, "timestamp": self.timestamp, "ts": self.ts_str}
+        if self.thread_ts is not None:
+            item["thread_ts"] = f"{self.thread_ts:.6f}"
+        return item
+
+
+class MessageBatch:
+    __slots__ = ("_ts", "_sender", "_parent", "_offsets", "_pending", "_text", "senders", "_sender_ids")
+
+    def __init__(self):
+        self._ts = array("d")
+        self._sender = array("I")
+        # Parent ts of a thread reply, 0.0 for top-level messages
+        self._parent = array("d")
+        self._offsets = array("Q", [0])
+        self._pending = []
+        self._text = ""
+        self.senders: List[str] = []
+        self._sender_ids: Dict[str, int] = {}
+
+    def append(self, ts: float, sender: str, text: str, thread_ts: Optional[float] = None):
+        sender_id = self._sender_ids.get(sender)
+        if sender_id is None:
+            sender_id = self._sender_ids[sender] = len(self.senders)
+            self.senders.append(sender)
+        self._ts.append(ts)
+        self._sender.append(sender_id)
+        self._parent.append(thread_ts or 0.0)
+        self._pending.append(text)
+        self._offsets.append(self._offsets[-1] + len(text))
+
+    def _buffer(self) -> str:
+        # Texts are joined into the buffer lazily, once per batch of appends
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+        return self._text
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    def text(self, i: int) -> str:
+        return self._buffer()[self._offsets[i]:self._offsets[i + 1]]
+
+    def __getitem__(self, i: int) -> Message:
+        if i < 0:
+            i += len(self)
+        parent = self._parent[i]
+        return Message(self._ts[i], self.senders[self._sender[i]], self.text(i), parent or None)
+
+    def __iter__(self) -> Iterator[Message]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def _take(self, indices: Iterable[int]) -> "MessageBatch":
+        batch = MessageBatch()
+        for i in indices:
+            batch.append(self._ts[i], self.senders[self._sender[i]], self.text(i), self._parent[i] or None)
+        return batch
+
+    def filter(self, start: Optional[float] = None, end: Optional[float] = None,
+               sender: Optional[str] = None) -> "MessageBatch":
+        """Return the messages with start <= ts <= end (thread replies follow their parent's time) from `sender`."""
+        sender_id = self._sender_ids.get(sender, -1) if sender is not None else None
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        timestamps, parents, senders = self._ts, self._parent, self._sender
+        return self._take(
+            i for i in range(len(timestamps))
+            if start <= (parents[i] or timestamps[i]) <= end
+            and (sender_id is None or senders[i] == sender_id)
+        )
+
+    def to_dicts(self) -> List[Dict]:
+        return [message.to_dict() for message in self]
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[Dict]) -> "MessageBatch":
+        batch = cls()
+        for item in items:
+            thread_ts = item.get("thread_ts")
+            batch.append(float(item["ts"]), item.get("sender", "Unknown"), item.get("text", ""),
+                         float(thread_ts) if thread_ts else None)
+        return batch
+
+    def prompt_lines(self) -> List[str]:
+        """One line per message: "MM-DD HH:MM sender: text", replies indented under their parent.
+
+        Whitespace inside a message is collapsed; the year is only shown when the
+        batch spans more than one.
+        """
+        if not len(self):
+            return []
+        years = {datetime.fromtimestamp(ts).year for ts in (min(self._ts), max(self._ts))}
+        time_format = "%m-%d %H:%M" if len(years) == 1 else "%Y-%m-%d %H:%M"
+        buffer = self._buffer()
+        lines = []
+        for i in range(len(self)):
+            prefix = "  ↳ " if self._parent[i] else ""
+            when = datetime.fromtimestamp(self._ts[i]).strftime(time_format)
+            text = " ".join(buffer[self._offsets[i]:self._offsets[i + 1]].split())
+            lines.append(f"{prefix}{when} {self.senders[self._sender[i]]}: {text}")
+        return lines
+
+    def to_prompt(self) -> str:
+        return "\n".join(self.prompt_lines())
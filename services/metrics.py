@@ -0,0 +1,223 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Every thread records into its own shard (a plain dict found through a
+threading.local), so recording a sample takes no lock and never contends with
+other request threads or the background loop. A scrape merges the shards; shards
+of threads that have exited are folded into one retired total so per-request
+threads do not pile up. Gauges such as cache hit rates and job queue depth are
+read from the owning services by collector callbacks at scrape time.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# (name, type, help, [(labels, value), ...])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class _Shard:
+    __slots__ = ("thread", "cells")
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        # (metric name, label values) -> list of floats, written only by `thread`
+        self.cells = {}
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+
+    def _cell(self, labels: tuple, size: int) -> List[float]:
+        cells = self.registry._cells()
+        key = (self.name, labels)
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = [0.0] * size
+        return cell
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, value: float = 1.0):
+        self._cell(labels, 1)[0] += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        # Layout: one count per bucket plus +Inf, then sum
+        cell = self._cell(labels, len(self.buckets) + 2)
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[_Shard] = []
+        self._retired = {}
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def _register(self, metric: _Metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[Family]]):
+        """Register a callback returning gauge/counter families to read at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def _cells(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._retire_dead()
+                self._shards.append(shard)
+        return shard.cells
+
+    @staticmethod
+    def _merge_into(target: dict, cells: dict):
+        # dict.copy() is atomic, so the owning thread may keep adding cells meanwhile
+        for key, cell in cells.copy().items():
+            merged = target.get(key)
+            if merged is None:
+                target[key] = list(cell)
+            else:
+                for i, value in enumerate(cell):
+                    merged[i] += value
+
+    def _retire_dead(self):
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                self._merge_into(self._retired, shard.cells)
+        self._shards = alive
+
+    def snapshot(self) -> dict:
+        """Merged {(name, label values): cell} across every thread."""
+        with self._lock:
+            self._retire_dead()
+            merged = {key: list(cell) for key, cell in self._retired.items()}
+            for shard in self._shards:
+                self._merge_into(merged, shard.cells)
+        return merged
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        by_metric = {}
+        for (name, labels), cell in snapshot.items():
+            by_metric.setdefault(name, []).append((labels, cell))
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, cell in sorted(by_metric.get(name, [])):
+                pairs = list(zip(metric.labelnames, labels))
+                if metric.kind == "counter":
+                    lines.append(f"{name}{_labels(pairs)} {_number(cell[0])}")
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(list(metric.buckets) + ["+Inf"], cell[:-1]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', le)])} {_number(cumulative)}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(cell[-1])}")
+                lines.append(f"{name}_count{_labels(pairs)} {_number(cumulative)}")
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                print(f"[DEBUG] Metrics collector {getattr(collect, '__name__', collect)} failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(list(labels.items()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _number(value) -> str:
+    if value is None:
+        return "NaN"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+# Shared by the Flask app and the services it calls
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    "nosyworker_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+http_request_seconds = metrics.histogram(
+    "nosyworker_http_request_duration_seconds", "Time to produce the HTTP response.", ("route", "method"))
+llm_requests = metrics.counter(
+    "nosyworker_llm_requests_total", "LLM completion calls by model and outcome.", ("model", "outcome"))
+llm_request_seconds = metrics.histogram(
+    "nosyworker_llm_request_duration_seconds", "LLM completion latency.", ("model",))
+stream_first_token_seconds = metrics.histogram(
+    "nosyworker_stream_first_token_seconds",
+    "Time from receiving a streaming summarize request to sending its first token.", ("route",))
+llm_tokens = metrics.counter(
+    "nosyworker_llm_tokens_total", "Tokens reported by the LLM API, by direction (prompt or completion).",
+    ("model", "direction"))
+mcp_tool_calls = metrics.counter(
+    "nosyworker_mcp_tool_calls_total", "MCP tool calls by server, tool and outcome.", ("server", "tool", "outcome"))
+mcp_tool_seconds = metrics.histogram(
+    "nosyworker_mcp_tool_duration_seconds", "MCP tool call latency.", ("server", "tool"))
+
+
+def record_request(route: str, method: str, status: int, seconds: float):
+    http_requests.inc(route, method, str(status))
+    http_request_seconds.observe(seconds, route, method)
+
+
+def record_llm_call(model: str, seconds: float, ok: bool, usage: Optional[dict] = None):
+    llm_requests.inc(model, "ok" if ok else "error")
+    llm_request_seconds.observe(seconds, model)
+    if usage:
+        llm_tokens.inc(model, "prompt", value=usage.get("prompt_tokens") or 0)
+        llm_tokens.inc(model, "completion", value=usage.get("completion_tokens") or 0)
+
+
+def record_mcp_call(server: str, tool: str, seconds: float, ok: bool):
+    mcp_tool_calls.inc(server, tool, "ok" if ok else "error")
+    mcp_tool_seconds.observe(seconds, server, tool)
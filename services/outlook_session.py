@@ -0,0 +1,193 @@
+"""
+Pool of warm Outlook MCP sessions.
+
+Each pooled session owns one `node ../outlook-mcp/index.js` child process and an
+initialized `ClientSession`. Sessions are started lazily, health-checked with an
+MCP ping, restarted transparently when the child dies, and closed on shutdown.
+All session work happens on the shared background loop.
+"""
+import asyncio
+import time
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from services import tracing
+from services.background_loop import background_loop
+from services.metrics import record_mcp_call
+
+
+class OutlookSessionError(RuntimeError):
+    """Raised when no healthy Outlook MCP session can be obtained."""
+
+
+class _PooledSession:
+    """One Outlook MCP child process plus its initialized ClientSession.
+
+    The stdio/ClientSession context managers are entered and exited by a single
+    owner task, which is what anyio's cancel scopes require.
+    """
+
+    def __init__(self, server_params: StdioServerParameters, index: int):
+        self.server_params = server_params
+        self.index = index
+        self.session = None
+        self.in_flight = 0
+        self.last_checked = 0.0
+        self._task = None
+        self._ready = None
+        self._closing = None
+        self._error = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self, timeout: float):
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._own(), name=f"outlook-mcp-{self.index}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise OutlookSessionError(f"Outlook MCP session {self.index} did not start within {timeout}s")
+        if self._error is not None or not self.alive:
+            raise OutlookSessionError(f"Outlook MCP session {self.index} failed to start: {self._error}")
+
+    async def _own(self):
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self.last_checked = time.monotonic()
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self._error = e
+            print(f"[DEBUG] Outlook MCP session {self.index} exited: {e}")
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def ping(self, timeout: float) -> bool:
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+        except Exception as e:
+            print(f"[DEBUG] Outlook MCP session {self.index} failed health check: {e}")
+            return False
+        self.last_checked = time.monotonic()
+        return True
+
+    async def close(self):
+        if self._closing is not None:
+            self._closing.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._task, 5)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+        self.session = None
+
+
+class OutlookSessionPool:
+    """Small pool of long-lived Outlook MCP sessions shared by all requests.
+
+    MCP multiplexes requests over one stdio pipe, so a session is not checked out
+    exclusively; calls go to the live session with the fewest requests in flight.
+    """
+
+    def __init__(self, server_params: StdioServerParameters, size: int = 2,
+                 health_check_interval: float = 30.0, start_timeout: float = 30.0):
+        self.server_params = server_params
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self.start_timeout = start_timeout
+        self._sessions = [_PooledSession(server_params, i) for i in range(self.size)]
+        self._locks = None
+        self.restart_count = 0
+        self._closed = False
+
+    async def call_tool(self, name: str, arguments: dict = None, retries: int = 1):
+        """Call an Outlook MCP tool on a warm session, callable from any event loop."""
+        return await background_loop.call(self._call_tool(name, arguments, retries))
+
+    async def _call_tool(self, name, arguments, retries):
+        attempt = 0
+        while True:
+            pooled = await self._acquire()
+            pooled.in_flight += 1
+            started = time.perf_counter()
+            try:
+                with tracing.span("mcp.call_tool", server="outlook", tool=name, session=pooled.index, attempt=attempt):
+                    result = await pooled.session.call_tool(name, arguments=arguments)
+                record_mcp_call("outlook", name, time.perf_counter() - started, ok=not result.isError)
+                return result
+            except Exception as e:
+                record_mcp_call("outlook", name, time.perf_counter() - started, ok=False)
+                # A dead child surfaces as a transport error; a tool error comes
+                # back as a normal result, so anything raised here is retried once
+                # on a fresh session.
+                if pooled.alive and await pooled.ping(5):
+                    raise
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                print(f"[DEBUG] Outlook MCP call '{name}' failed on session {pooled.index}, restarting: {e}")
+                await pooled.close()
+            finally:
+                pooled.in_flight -= 1
+
+    async def _acquire(self) -> _PooledSession:
+        if self._closed:
+            raise OutlookSessionError("Outlook session pool is shut down")
+        if self._locks is None:
+            self._locks = [asyncio.Lock() for _ in self._sessions]
+        # Least loaded first; start or heal a session only when it is picked
+        candidates = sorted(self._sessions, key=lambda s: (not s.alive, s.in_flight))
+        last_error = None
+        for pooled in candidates:
+            try:
+                await self._ensure_healthy(pooled)
+                return pooled
+            except OutlookSessionError as e:
+                last_error = e
+        raise OutlookSessionError(f"No healthy Outlook MCP session available: {last_error}")
+
+    async def _ensure_healthy(self, pooled: _PooledSession):
+        async with self._locks[pooled.index]:
+            if pooled.alive:
+                stale = time.monotonic() - pooled.last_checked > self.health_check_interval
+                if not stale or pooled.in_flight or await pooled.ping(5):
+                    return
+                await pooled.close()
+            if pooled._task is not None:
+                self.restart_count += 1
+                print(f"[DEBUG] Restarting Outlook MCP session {pooled.index}")
+            with tracing.span("mcp.connect", server="outlook", session=pooled.index):
+                await pooled.start(self.start_timeout)
+
+    async def _close_all(self):
+        self._closed = True
+        await asyncio.gather(*(s.close() for s in self._sessions), return_exceptions=True)
+
+    def shutdown(self, timeout: float = 10.0):
+        """Close every session and terminate the node children."""
+        if self._closed or not any(s._task for s in self._sessions):
+            self._closed = True
+            return
+        try:
+            background_loop.run(self._close_all(), timeout)
+        except Exception as e:
+            print(f"[DEBUG] Error shutting down Outlook session pool: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "alive": sum(1 for s in self._sessions if s.alive),
+            "in_flight": sum(s.in_flight for s in self._sessions),
+            "restarts": self.restart_count,
+        }
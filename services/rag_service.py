@@ -0,0 +1,326 @@
+"""
+Retrieval-augmented answering over a persistent FAISS index.
+
+The embedding model is loaded once per process, and the index plus document
+metadata are stored on disk so a restart does not re-embed anything. Documents
+are added, updated and removed by key; unchanged documents are never re-encoded.
+A query costs one query embedding, one index search and the LLM call.
+
+Vectors are always kept in an exact flat store (`index.faiss`). With
+`index_type="ivf"` or `"hnsw"` an approximate-nearest-neighbour index
+(`ann.faiss`) is built from that store once the corpus reaches `ann_min_size`
+documents, and rebuilt (re-trained) whenever the corpus has grown by
+`retrain_growth` since the last build. `nprobe` (IVF) and `ef_search` (HNSW)
+trade recall for latency at query time.
+"""
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from services.llm_client import llm_client
+from services.embedding_cache import EmbeddingCache, EmbeddingPipeline
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+ANSWER_MODEL = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
+
+ANSWER_PROMPT = """Answer the question based on the provided context documents.
+
+    Context:
+    {context}
+
+    Question: {question}
+
+    Instructions:
+    - Answer based only on the information in the context
+    - Answer should beat least 10 words at max 20 words
+    - If the context doesn't contain enough information, say so
+    - Mention which document(s) you're referencing
+    - Start with According to [document name]
+    - Add brackets to the document name
+
+
+    Answer:"""
+
+
+class RAGService:
+    def __init__(self, index_dir: str, model_name: str = EMBEDDING_MODEL, answer_model: str = ANSWER_MODEL,
+                 index_type: str = "flat", ann_min_size: int = 2000, retrain_growth: float = 2.0,
+                 nlist: Optional[int] = None, nprobe: int = 16, hnsw_m: int = 32,
+                 ef_construction: int = 80, ef_search: int = 64,
+                 embedding_batch_size: int = 64, multiprocess_threshold: int = 5000):
+        if index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"Unknown index type: {index_type}")
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self.answer_model = answer_model
+        self.index_type = index_type
+        self.ann_min_size = ann_min_size
+        self.retrain_growth = retrain_growth
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.ann = None
+        self._trained_size = 0
+        self._tombstones = 0
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self.index = None
+        # key -> {"id": int, "content": str, "metadata": dict}
+        self.documents = {}
+        self._keys_by_id = {}
+        self._next_id = 0
+        # Document vectors are cached by content hash, so re-indexing unchanged text is free
+        self.embedding_pipeline = EmbeddingPipeline(
+            lambda: self.embedding_model,
+            EmbeddingCache(os.path.join(index_dir, "embeddings"), model_name),
+            batch_size=embedding_batch_size,
+            multiprocess_threshold=multiprocess_threshold,
+        )
+        self.load()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.index_dir, "index.faiss")
+
+    @property
+    def ann_path(self) -> str:
+        return os.path.join(self.index_dir, "ann.faiss")
+
+    @property
+    def documents_path(self) -> str:
+        return os.path.join(self.index_dir, "documents.json")
+
+    @property
+    def embedding_model(self):
+        """The sentence transformer, loaded on first use and kept for the process lifetime."""
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(
+                    self.model_name,
+                    use_auth_token=os.environ.get("HUGGINGFACE_HUB_TOKEN"),
+                )
+            return self._model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed queries directly; they are not worth caching."""
+        embeddings = np.asarray(self.embedding_model.encode(texts), dtype="float32")
+        # Normalize embeddings for cosine similarity
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed documents through the batched, cached pipeline."""
+        return self.embedding_pipeline.embed(texts)
+
+    def _new_index(self, dimension: int):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    def load(self):
+        with self._lock:
+            if not os.path.exists(self.documents_path) or not os.path.exists(self.index_path):
+                return
+            with open(self.documents_path, "r") as f:
+                data = json.load(f)
+            if data.get("model") != self.model_name:
+                print(f"[DEBUG] RAG index at {self.index_dir} was built with {data.get('model')}, ignoring it")
+                return
+            self.index = faiss.read_index(self.index_path)
+            self.documents = data["documents"]
+            self._next_id = data["next_id"]
+            self._keys_by_id = {doc["id"]: key for key, doc in self.documents.items()}
+            ann = data.get("ann") or {}
+            if ann.get("type") == self.index_type and os.path.exists(self.ann_path):
+                self.ann = faiss.read_index(self.ann_path)
+                self._trained_size = ann.get("trained_size", 0)
+                self._tombstones = ann.get("tombstones", 0)
+            self._maybe_rebuild_ann()
+
+    def save(self):
+        with self._lock:
+            if self.index is None:
+                return
+            os.makedirs(self.index_dir, exist_ok=True)
+            faiss.write_index(self.index, self.index_path + ".tmp")
+            os.replace(self.index_path + ".tmp", self.index_path)
+            ann = None
+            if self.ann is not None:
+                faiss.write_index(self.ann, self.ann_path + ".tmp")
+                os.replace(self.ann_path + ".tmp", self.ann_path)
+                ann = {"type": self.index_type, "trained_size": self._trained_size, "tombstones": self._tombstones}
+            with open(self.documents_path + ".tmp", "w") as f:
+                json.dump({"model": self.model_name, "next_id": self._next_id, "ann": ann,
+                           "documents": self.documents}, f)
+            os.replace(self.documents_path + ".tmp", self.documents_path)
+
+    def _all_vectors(self):
+        ids = faiss.vector_to_array(self.index.id_map).astype("int64")
+        return ids, self.index.index.reconstruct_n(0, self.index.ntotal)
+
+    def _build_ann(self):
+        """(Re-)train the approximate index from every vector in the exact store."""
+        ids, vectors = self._all_vectors()
+        n, dimension = vectors.shape
+        if self.index_type == "ivf":
+            # ~4*sqrt(n) lists, but at least 39 training points per centroid
+            nlist = self.nlist or int(4 * math.sqrt(n))
+            nlist = max(1, min(nlist, n // 39))
+            quantizer = faiss.IndexFlatIP(dimension)
+            ann = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            ann.train(vectors)
+        else:
+            inner = faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            inner.hnsw.efConstruction = self.ef_construction
+            ann = faiss.IndexIDMap2(inner)
+        ann.add_with_ids(vectors, ids)
+        self.ann = ann
+        self._trained_size = n
+        self._tombstones = 0
+        print(f"[DEBUG] Built {self.index_type} RAG index over {n} documents")
+
+    def _maybe_rebuild_ann(self):
+        n = 0 if self.index is None else self.index.ntotal
+        if self.index_type == "flat" or n < self.ann_min_size:
+            self.ann = None
+            return
+        if (self.ann is None or n >= self._trained_size * self.retrain_growth
+                or self._tombstones > 0.2 * max(1, self.ann.ntotal)):
+            self._build_ann()
+
+    def retrain(self, save: bool = True):
+        """Rebuild the approximate index now, e.g. after the corpus changed shape."""
+        with self._lock:
+            if self.index is not None and self.index_type != "flat" and self.index.ntotal:
+                self._build_ann()
+                if save:
+                    self.save()
+
+    def add_documents(self, docs: Dict[str, str], metadata: Optional[Dict[str, dict]] = None, save: bool = True) -> int:
+        """Add or update documents by key; returns how many were (re-)embedded.
+
+        `save=False` leaves saving and approximate-index maintenance to the caller.
+        """
+        metadata = metadata or {}
+        changed = {}
+        with self._lock:
+            for key, content in docs.items():
+                content = content.strip()
+                existing = self.documents.get(key)
+                if content and (existing is None or existing["content"] != content):
+                    changed[key] = content
+        if not changed:
+            return 0
+        embeddings = self.embed_documents(list(changed.values()))
+        with self._lock:
+            self._remove_locked([key for key in changed if key in self.documents])
+            if self.index is None:
+                self.index = self._new_index(embeddings.shape[1])
+            ids = np.arange(self._next_id, self._next_id + len(changed), dtype="int64")
+            self._next_id += len(changed)
+            self.index.add_with_ids(embeddings, ids)
+            if self.ann is not None:
+                self.ann.add_with_ids(embeddings, ids)
+            for doc_id, (key, content) in zip(ids.tolist(), changed.items()):
+                self.documents[key] = {"id": doc_id, "content": content, "metadata": metadata.get(key, {})}
+                self._keys_by_id[doc_id] = key
+            if save:
+                self._maybe_rebuild_ann()
+                self.save()
+        return len(changed)
+
+    def _remove_locked(self, keys: List[str]) -> int:
+        ids = [self.documents[key]["id"] for key in keys if key in self.documents]
+        if not ids or self.index is None:
+            return 0
+        id_array = np.asarray(ids, dtype="int64")
+        self.index.remove_ids(id_array)
+        if self.ann is not None:
+            if self.index_type == "ivf":
+                self.ann.remove_ids(id_array)
+            else:
+                # HNSW cannot delete; removed ids are filtered at search time until the next rebuild
+                self._tombstones += len(ids)
+        for key in keys:
+            doc = self.documents.pop(key, None)
+            if doc is not None:
+                self._keys_by_id.pop(doc["id"], None)
+        return len(ids)
+
+    def remove_documents(self, keys: List[str], save: bool = True) -> int:
+        with self._lock:
+            removed = self._remove_locked(keys)
+            if removed and save:
+                self._maybe_rebuild_ann()
+                self.save()
+        return removed
+
+    def sync_documents(self, docs: Dict[str, str], metadata: Optional[Dict[str, dict]] = None) -> Dict[str, int]:
+        """Make the index hold exactly `docs`: embed new/changed ones and drop the rest."""
+        with self._lock:
+            stale = [key for key in self.documents if key not in docs]
+        removed = self.remove_documents(stale, save=False)
+        added = self.add_documents(docs, metadata, save=False)
+        if removed or added:
+            with self._lock:
+                self._maybe_rebuild_ann()
+                self.save()
+        return {"added": added, "removed": removed, "total": len(self.documents)}
+
+    def search(self, query: str, k: int = 3) -> List[dict]:
+        """Return the `k` documents most similar to `query`, best first."""
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+        query_embedding = self.embed([query])
+        with self._lock:
+            if self.ann is not None:
+                self._set_search_params()
+                scores, ids = self.ann.search(query_embedding, min(k + self._tombstones, self.ann.ntotal))
+            else:
+                scores, ids = self.index.search(query_embedding, min(k, self.index.ntotal))
+            results = []
+            for score, doc_id in zip(scores[0], ids[0]):
+                key = self._keys_by_id.get(int(doc_id))
+                if key is None:
+                    continue
+                doc = self.documents[key]
+                results.append({"key": key, "content": doc["content"], "metadata": doc["metadata"], "score": float(score)})
+                if len(results) == k:
+                    break
+        return results
+
+    def _set_search_params(self):
+        if self.index_type == "ivf":
+            faiss.extract_index_ivf(self.ann).nprobe = self.nprobe
+        else:
+            faiss.downcast_index(self.ann.index).hnsw.efSearch = self.ef_search
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self.documents),
+                "index_type": self.index_type if self.ann is not None else "flat",
+                "trained_size": self._trained_size,
+                "tombstones": self._tombstones,
+                "embeddings_cached": self.embedding_pipeline.cache.rows,
+                "embeddings_encoded": self.embedding_pipeline.encoded,
+                "embedding_cache_hits": self.embedding_pipeline.cache_hits,
+            }
+
+    def answer(self, question: str, k: int = 3) -> dict:
+        """Retrieve context for `question` and generate an answer with the LLM."""
+        relevant_docs = self.search(question, k)
+        if not relevant_docs:
+            return {"answer": None, "sources": []}
+        context = "\n\n".join(f"[{doc['key']}]\n{doc['content']}" for doc in relevant_docs)
+        prompt = ANSWER_PROMPT.format(context=context, question=question)
+        answer = llm_client.complete_sync(None, prompt, self.answer_model, max_tokens=500, temperature=0.7)
+        return {"answer": answer, "sources": relevant_docs}
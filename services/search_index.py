@@ -0,0 +1,183 @@
+"""
+Local keyword search and hybrid (keyword + vector) retrieval.
+
+`BM25Index` is an incremental inverted index over the same documents as the RAG
+index, persisted next to it. `HybridSearcher` runs it together with the FAISS
+vector search and merges the two rankings with reciprocal rank fusion; both
+sides honour channel / sender / time-range / source filters. Searching never
+touches the Slack API.
+"""
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        # term -> {key: term frequency}
+        self.postings = defaultdict(dict)
+        # key -> {"length": int, "content": str, "metadata": dict}
+        self.documents = {}
+        self.total_length = 0
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"[DEBUG] Could not load keyword index {self.path}: {e}")
+            return
+        with self._lock:
+            self.postings = defaultdict(dict, data["postings"])
+            self.documents = data["documents"]
+            self.total_length = sum(doc["length"] for doc in self.documents.values())
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "wb") as f:
+                pickle.dump({"postings": dict(self.postings), "documents": self.documents}, f)
+            os.replace(self.path + ".tmp", self.path)
+
+    def _remove_locked(self, key: str):
+        doc = self.documents.pop(key, None)
+        if doc is None:
+            return
+        self.total_length -= doc["length"]
+        for term in set(tokenize(doc["content"])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self.postings[term]
+
+    def sync(self, documents: Dict[str, str], metadata: Optional[Dict[str, dict]] = None) -> Dict[str, int]:
+        """Make the index hold exactly `documents`, re-tokenizing only new or changed ones."""
+        metadata = metadata or {}
+        added = removed = 0
+        with self._lock:
+            for key in [key for key in self.documents if key not in documents]:
+                self._remove_locked(key)
+                removed += 1
+            for key, content in documents.items():
+                existing = self.documents.get(key)
+                if existing is not None and existing["content"] == content:
+                    existing["metadata"] = metadata.get(key, {})
+                    continue
+                self._remove_locked(key)
+                terms = Counter(tokenize(content))
+                for term, frequency in terms.items():
+                    self.postings[term][key] = frequency
+                length = sum(terms.values())
+                self.documents[key] = {"length": length, "content": content, "metadata": metadata.get(key, {})}
+                self.total_length += length
+                added += 1
+            if added or removed:
+                self.save()
+        return {"added": added, "removed": removed, "total": len(self.documents)}
+
+    def search(self, query: str, k: int = 10, accept=None) -> List[dict]:
+        """Return up to `k` documents ranked by BM25; `accept(metadata)` filters candidates."""
+        with self._lock:
+            n = len(self.documents)
+            if not n:
+                return []
+            average_length = self.total_length / n
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    length = self.documents[key]["length"]
+                    norm = frequency + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[key] += idf * frequency * (self.k1 + 1) / norm
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for key, score in ranked:
+                doc = self.documents[key]
+                if accept is not None and not accept(doc["metadata"]):
+                    continue
+                results.append({"key": key, "content": doc["content"], "metadata": doc["metadata"], "score": score})
+                if len(results) == k:
+                    break
+        return results
+
+
+def make_filter(channel: Optional[str] = None, sender: Optional[str] = None, start: Optional[float] = None,
+                end: Optional[float] = None, source: Optional[str] = None):
+    """Build a metadata predicate; returns None when no filter is set."""
+    if not any(value is not None for value in (channel, sender, start, end, source)):
+        return None
+    sender = sender.lower() if sender else None
+
+    def accept(metadata: dict) -> bool:
+        if channel is not None and metadata.get("channel") != channel:
+            return False
+        if source is not None and metadata.get("source") != source:
+            return False
+        if sender is not None and sender not in (metadata.get("sender") or "").lower():
+            return False
+        if start is not None or end is not None:
+            timestamp = metadata.get("timestamp")
+            if timestamp is None:
+                return False
+            if start is not None and timestamp < start:
+                return False
+            if end is not None and timestamp > end:
+                return False
+        return True
+
+    return accept
+
+
+def reciprocal_rank_fusion(rankings: List[List[dict]], k: int = 60) -> List[dict]:
+    """Merge ranked result lists; each document scores sum(1 / (k + rank))."""
+    fused, docs = defaultdict(float), {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            fused[doc["key"]] += 1.0 / (k + rank + 1)
+            docs.setdefault(doc["key"], doc)
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [{**docs[key], "score": score} for key, score in ordered]
+
+
+class HybridSearcher:
+    def __init__(self, rag_service, keyword_index: BM25Index, candidates: int = 50):
+        self.rag = rag_service
+        self.keywords = keyword_index
+        self.candidates = candidates
+
+    def search(self, query: str, k: int = 10, mode: str = "hybrid", **filters) -> List[dict]:
+        """Search with `mode` "keyword", "vector" or "hybrid" (both, fused)."""
+        accept = make_filter(**filters)
+        rankings = []
+        if mode in ("keyword", "hybrid"):
+            rankings.append(self.keywords.search(query, self.candidates, accept))
+        if mode in ("vector", "hybrid"):
+            # Over-fetch, then filter: FAISS cannot filter on metadata
+            vector_results = self.rag.search(query, self.candidates)
+            rankings.append([doc for doc in vector_results if accept is None or accept(doc["metadata"])])
+        if len(rankings) == 1:
+            return rankings[0][:k]
+        return reciprocal_rank_fusion(rankings)[:k]
@@ -0,0 +1,169 @@
+"""
+Long-lived connection to the Slack MCP server.
+
+One fastmcp `Client` session to `part1/mcp_server.py` is opened on the shared
+background loop and kept for the life of the process. MCP multiplexes requests
+by id, so concurrent Flask requests share the session instead of each opening
+(and racing on) their own. A transport failure closes the session; the next call
+reconnects, and the failed call is retried once. Connect time and per-tool
+latency are recorded for `stats()`.
+"""
+import asyncio
+import time
+from fastmcp import Client
+from fastmcp.client.transports import StreamableHttpTransport
+from fastmcp.exceptions import ToolError
+
+from services import tracing
+from services.background_loop import background_loop
+from services.metrics import record_mcp_call
+
+
+class SlackMCPError(RuntimeError):
+    """Raised when the Slack MCP server cannot be reached."""
+
+
+class SlackMCPClient:
+    def __init__(self, server_url: str, connect_timeout: float = 10.0):
+        self.server_url = server_url
+        self.connect_timeout = connect_timeout
+        self.client = None
+        self._task = None
+        self._ready = None
+        self._closing = None
+        self._error = None
+        self._lock = None
+        self._closed = False
+        self.connects = 0
+        self.last_connect_seconds = None
+        self.in_flight = 0
+        self._latency = {}
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None and self._task is not None and not self._task.done()
+
+    async def call_tool(self, name: str, arguments: dict = None, retries: int = 1):
+        """Call a Slack MCP tool over the shared session, callable from any event loop."""
+        return await background_loop.call(self._call_tool(name, arguments, retries))
+
+    async def _call_tool(self, name, arguments, retries):
+        attempt = 0
+        while True:
+            client = await self._ensure_connected()
+            started = time.perf_counter()
+            self.in_flight += 1
+            try:
+                with tracing.span("mcp.call_tool", server="slack", tool=name, attempt=attempt):
+                    result = await client.call_tool(name, arguments or {})
+                self._record(name, time.perf_counter() - started, ok=True)
+                # fastmcp >= 2.10 wraps the content list in a CallToolResult; callers index the list
+                return getattr(result, "content", result)
+            except ToolError:
+                # The tool ran and reported an error; the session is fine
+                self._record(name, time.perf_counter() - started, ok=False)
+                raise
+            except Exception as e:
+                self._record(name, time.perf_counter() - started, ok=False)
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                print(f"[DEBUG] Slack MCP call '{name}' failed, reconnecting: {e}")
+                await self._disconnect(client)
+            finally:
+                self.in_flight -= 1
+
+    def _record(self, name: str, seconds: float, ok: bool):
+        record_mcp_call("slack", name, seconds, ok)
+        entry = self._latency.setdefault(name, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        entry["calls"] += 1
+        entry["errors"] += 0 if ok else 1
+        entry["total_seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    async def _ensure_connected(self) -> Client:
+        if self._closed:
+            raise SlackMCPError("Slack MCP client is shut down")
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.connected:
+                return self.client
+            with tracing.span("mcp.connect", server="slack"):
+                await self._connect()
+            return self.client
+
+    async def _connect(self):
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        started = time.perf_counter()
+        self._task = asyncio.create_task(self._own(), name="slack-mcp")
+        try:
+            await asyncio.wait_for(self._ready.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            await self._close_task()
+            raise SlackMCPError(f"Slack MCP server at {self.server_url} did not connect within {self.connect_timeout}s")
+        if not self.connected:
+            raise SlackMCPError(f"Could not connect to the Slack MCP server at {self.server_url}: {self._error}")
+        self.connects += 1
+        self.last_connect_seconds = time.perf_counter() - started
+        print(f"[DEBUG] Connected to Slack MCP server in {self.last_connect_seconds * 1000:.0f} ms "
+              f"(connection #{self.connects})")
+
+    async def _own(self):
+        # The transport's context managers are entered and exited by this one task
+        try:
+            async with Client(StreamableHttpTransport(self.server_url)) as client:
+                self.client = client
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+            print(f"[DEBUG] Slack MCP session exited: {e}")
+        finally:
+            self.client = None
+            self._ready.set()
+
+    async def _disconnect(self, client: Client):
+        async with self._lock:
+            # Another caller may already have replaced the failed session
+            if self.client is client:
+                await self._close_task()
+
+    async def _close_task(self):
+        if self._closing is not None:
+            self._closing.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._task, 5)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+        self.client = None
+
+    def shutdown(self, timeout: float = 10.0):
+        """Close the session if one was opened."""
+        self._closed = True
+        if self._task is None or self._task.done():
+            return
+        try:
+            background_loop.run(self._close_task(), timeout)
+        except Exception as e:
+            print(f"[DEBUG] Error closing Slack MCP session: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "last_connect_ms": None if self.last_connect_seconds is None else self.last_connect_seconds * 1000,
+            "in_flight": self.in_flight,
+            "tools": {
+                name: {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "avg_ms": entry["total_seconds"] / entry["calls"] * 1000,
+                    "max_ms": entry["max_seconds"] * 1000,
+                }
+                for name, entry in self._latency.items()
+            },
+        }
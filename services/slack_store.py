@@ -0,0 +1,274 @@
+"""
+Local SQLite store for Slack channel history.
+
+Messages are keyed by (channel_id, ts). For every channel the store remembers the
+contiguous time range it has already synced (`synced_oldest` .. `watermark`), so a
+summarize request only asks Slack for the part of its window that is not covered
+yet. The most recent `edit_window` seconds below the watermark are re-fetched on
+each delta so edits and deletions of recent messages are picked up. Thread replies
+are stored alongside their parents; a channel synced without threads is fetched
+again in full the first time threads are requested.
+
+Replies to parents older than the re-fetched window do not show up in the
+history, so `stale_threads` names the stored threads whose replies are due for
+a re-check: those with activity (parent or latest reply) within
+`thread_active_window` seconds, checked more than `thread_refresh_interval`
+seconds ago. Replies to such threads are therefore at most
+`thread_refresh_interval` stale. Not covered: new replies to threads that were
+quiet for longer than `thread_active_window`, and the first reply to an older
+message that had none (it is not a thread parent in the store yet).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class SlackMessageStore:
+    def __init__(self, path: str, edit_window: float = 3600.0, thread_refresh_interval: float = 300.0,
+                 thread_active_window: float = 7 * 24 * 3600):
+        self.path = path
+        self.edit_window = edit_window
+        self.thread_refresh_interval = thread_refresh_interval
+        self.thread_active_window = thread_active_window
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                channel_id TEXT NOT NULL,
+                ts TEXT NOT NULL,
+                ts_num REAL NOT NULL,
+                thread_ts TEXT,
+                data TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (channel_id, ts)
+            );
+            CREATE INDEX IF NOT EXISTS messages_by_time ON messages (channel_id, ts_num);
+            CREATE TABLE IF NOT EXISTS channel_sync (
+                channel_id TEXT PRIMARY KEY,
+                synced_oldest REAL NOT NULL,
+                watermark REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                threads INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS messages_by_thread ON messages (channel_id, thread_ts);
+            CREATE TABLE IF NOT EXISTS thread_sync (
+                channel_id TEXT NOT NULL,
+                thread_ts TEXT NOT NULL,
+                checked_at REAL NOT NULL,
+                PRIMARY KEY (channel_id, thread_ts)
+            );
+        """)
+        try:
+            # Stores created before thread expansion
+            self._conn.execute("ALTER TABLE channel_sync ADD COLUMN threads INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+        self._conn.commit()
+
+    def sync_state(self, channel_id: str) -> Optional[Tuple[float, float]]:
+        """Return (synced_oldest, watermark) for a channel, or None if never synced."""
+        state = self._state(channel_id)
+        return state[:2] if state else None
+
+    def _state(self, channel_id: str) -> Optional[Tuple[float, float, int]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_oldest, watermark, threads FROM channel_sync WHERE channel_id = ?",
+                (channel_id,),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def plan_sync(self, channel_id: str, oldest: float, latest: float, now: Optional[float] = None,
+                  threads: bool = False) -> List[Tuple[float, float]]:
+        """Return the (oldest, latest) windows that still have to be fetched from Slack.
+
+        The synced range is kept contiguous: a request older than it is backfilled
+        up to `synced_oldest`, and a request newer than the watermark is fetched
+        from `watermark - edit_window` on.
+        """
+        now = time.time() if now is None else now
+        latest = min(latest, now) if latest else now
+        state = self._state(channel_id)
+        if state is None or (threads and not state[2]):
+            return [(oldest, latest)]
+        synced_oldest, watermark, _ = state
+        windows = []
+        if oldest < synced_oldest:
+            windows.append((oldest, synced_oldest))
+        if latest > watermark:
+            windows.append((max(synced_oldest, watermark - self.edit_window), latest))
+        return windows
+
+    def apply_window(self, channel_id: str, oldest: float, latest: float, messages: List[Dict], threads: bool = False):
+        """Store a freshly fetched window and extend the channel's synced range.
+
+        Top-level messages stored strictly inside the window that Slack no longer
+        returned are marked deleted. With `threads`, `messages` also holds the
+        complete replies of every threaded parent, and stored replies missing
+        from those threads are marked deleted too.
+        """
+        seen = set()
+        rows = []
+        for msg in messages:
+            ts = msg.get("ts")
+            if not ts:
+                continue
+            seen.add(ts)
+            deleted = 1 if msg.get("subtype") == "tombstone" else 0
+            rows.append((channel_id, ts, float(ts), msg.get("thread_ts"), json.dumps(msg), deleted))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO messages (channel_id, ts, ts_num, thread_ts, data, deleted) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (channel_id, ts) DO UPDATE SET ts_num = excluded.ts_num, "
+                "thread_ts = excluded.thread_ts, data = excluded.data, deleted = excluded.deleted",
+                rows,
+            )
+            stored = self._conn.execute(
+                "SELECT ts FROM messages WHERE channel_id = ? AND ts_num > ? AND ts_num < ? AND deleted = 0 "
+                "AND (thread_ts IS NULL OR thread_ts = ts)",
+                (channel_id, oldest, latest),
+            ).fetchall()
+            gone = [(channel_id, ts) for (ts,) in stored if ts not in seen]
+            if threads:
+                parents = [msg["ts"] for msg in messages if msg.get("reply_count", 0) > 0]
+                for parent in parents:
+                    gone.extend((channel_id, ts) for ts in self._stored_replies(channel_id, parent) if ts not in seen)
+                self._mark_checked(channel_id, parents)
+            if gone:
+                self._conn.executemany(
+                    "UPDATE messages SET deleted = 1 WHERE channel_id = ? AND ts = ?", gone
+                )
+            state = self._conn.execute(
+                "SELECT synced_oldest, watermark, threads FROM channel_sync WHERE channel_id = ?",
+                (channel_id,),
+            ).fetchone()
+            if state is None or (threads and not state[2]):
+                # First sync, or the first one with threads: the range restarts at this window
+                synced_oldest, watermark, synced_threads = oldest, latest, threads
+            else:
+                synced_oldest, watermark = min(state[0], oldest), max(state[1], latest)
+                synced_threads = bool(state[2]) and threads
+            self._conn.execute(
+                "INSERT INTO channel_sync (channel_id, synced_oldest, watermark, updated_at, threads) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (channel_id) DO UPDATE SET synced_oldest = excluded.synced_oldest, "
+                "watermark = excluded.watermark, updated_at = excluded.updated_at, threads = excluded.threads",
+                (channel_id, synced_oldest, watermark, time.time(), int(synced_threads)),
+            )
+
+    def _stored_replies(self, channel_id: str, parent: str) -> List[str]:
+        rows = self._conn.execute(
+            "SELECT ts FROM messages WHERE channel_id = ? AND thread_ts = ? AND ts != thread_ts AND deleted = 0",
+            (channel_id, parent),
+        ).fetchall()
+        return [ts for (ts,) in rows]
+
+    def _mark_checked(self, channel_id: str, parents: List[str], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._conn.executemany(
+            "INSERT INTO thread_sync (channel_id, thread_ts, checked_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (channel_id, thread_ts) DO UPDATE SET checked_at = excluded.checked_at",
+            [(channel_id, parent, now) for parent in parents],
+        )
+
+    def stale_threads(self, channel_id: str, oldest: float, latest: float, now: Optional[float] = None,
+                      limit: int = 0) -> List[str]:
+        """Return the stored thread parents in the window whose replies should be fetched again.
+
+        A thread qualifies when its parent or latest reply is newer than
+        `thread_active_window` and its replies were last fetched more than
+        `thread_refresh_interval` ago. Most recently active first, at most
+        `limit` of them (0 means no cap).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.ts, m.data, t.checked_at FROM messages m LEFT JOIN thread_sync t "
+                "ON t.channel_id = m.channel_id AND t.thread_ts = m.ts "
+                "WHERE m.channel_id = ? AND m.ts_num >= ? AND m.ts_num <= ? AND m.deleted = 0 AND m.thread_ts = m.ts",
+                (channel_id, oldest, latest),
+            ).fetchall()
+        stale = []
+        for ts, data, checked_at in rows:
+            if checked_at is not None and now - checked_at < self.thread_refresh_interval:
+                continue
+            parent = json.loads(data)
+            if not parent.get("reply_count"):
+                continue
+            last_activity = max(float(ts), float(parent.get("latest_reply") or 0))
+            if now - last_activity <= self.thread_active_window:
+                stale.append((last_activity, ts))
+        stale.sort(reverse=True)
+        return [ts for _, ts in (stale[:limit] if limit else stale)]
+
+    def apply_thread(self, channel_id: str, thread_ts: str, replies: List[Dict]):
+        """Store the complete, freshly fetched replies of one thread.
+
+        Stored replies missing from `replies` are marked deleted, and the
+        parent's `reply_count` and `latest_reply` are brought up to date.
+        """
+        rows = [
+            (channel_id, msg["ts"], float(msg["ts"]), thread_ts, json.dumps(msg),
+             1 if msg.get("subtype") == "tombstone" else 0)
+            for msg in replies if msg.get("ts") and msg["ts"] != thread_ts
+        ]
+        seen = {row[1] for row in rows}
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO messages (channel_id, ts, ts_num, thread_ts, data, deleted) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (channel_id, ts) DO UPDATE SET ts_num = excluded.ts_num, "
+                "thread_ts = excluded.thread_ts, data = excluded.data, deleted = excluded.deleted",
+                rows,
+            )
+            gone = [(channel_id, ts) for ts in self._stored_replies(channel_id, thread_ts) if ts not in seen]
+            if gone:
+                self._conn.executemany(
+                    "UPDATE messages SET deleted = 1 WHERE channel_id = ? AND ts = ?", gone
+                )
+            row = self._conn.execute(
+                "SELECT data FROM messages WHERE channel_id = ? AND ts = ?", (channel_id, thread_ts)
+            ).fetchone()
+            if row and rows:
+                parent = json.loads(row[0])
+                parent["reply_count"] = sum(1 for row in rows if not row[5])
+                parent["latest_reply"] = max((r[1] for r in rows), key=float)
+                self._conn.execute(
+                    "UPDATE messages SET data = ? WHERE channel_id = ? AND ts = ?",
+                    (json.dumps(parent), channel_id, thread_ts),
+                )
+            self._mark_checked(channel_id, [thread_ts])
+
+    def messages_in_range(self, channel_id: str, oldest: float, latest: float) -> List[Dict]:
+        """Return stored, non-deleted top-level messages in the window, newest first (Slack order)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE channel_id = ? AND ts_num >= ? AND ts_num <= ? AND deleted = 0 "
+                "AND (thread_ts IS NULL OR thread_ts = ts) ORDER BY ts_num DESC",
+                (channel_id, oldest, latest),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def replies_for(self, channel_id: str, thread_ts: List[str]) -> Dict[str, List[Dict]]:
+        """Return stored, non-deleted replies grouped by parent ts, oldest first."""
+        replies = {}
+        with self._lock:
+            for parent in thread_ts:
+                rows = self._conn.execute(
+                    "SELECT data FROM messages WHERE channel_id = ? AND thread_ts = ? AND ts != thread_ts "
+                    "AND deleted = 0 ORDER BY ts_num",
+                    (channel_id, parent),
+                ).fetchall()
+                if rows:
+                    replies[parent] = [json.loads(data) for (data,) in rows]
+        return replies
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
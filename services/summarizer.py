@@ -0,0 +1,130 @@
+"""
+Hierarchical (map-reduce) summarization for conversations larger than one prompt.
+
+The conversation is split into chunks on message boundaries by an estimated token
+budget, every chunk is summarized concurrently (map), and the partial summaries are
+merged `fan_in` at a time until one summary is left (reduce). A conversation that
+fits in one chunk costs a single LLM call, as before.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from services.message_batch import MessageBatch
+
+# async complete(system_prompt, user_content, model) -> completion text
+CompleteFn = Callable[[str, str, str], Awaitable[str]]
+
+# Rough characters-per-token ratio for Llama-family tokenizers on English chat
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def conversation_units(conversation) -> List[str]:
+    """Split a conversation into the units chunks may not cut through (messages/emails)."""
+    if isinstance(conversation, str):
+        separator = "\n---\n" if "\n---\n" in conversation else "\n"
+        return [unit for unit in conversation.split(separator) if unit.strip()]
+    if isinstance(conversation, MessageBatch):
+        return conversation.prompt_lines()
+    units = []
+    for item in conversation:
+        if isinstance(item, dict) and "text" in item:
+            # Thread replies are indented under their parent
+            prefix = "  ↳ " if item.get("thread_ts") else ""
+            units.append(f"{prefix}[{item.get('timestamp', '')}] {item.get('sender', 'Unknown')}: {item['text']}")
+        else:
+            units.append(str(item))
+    return units
+
+
+def split_into_chunks(units: List[str], max_tokens: int) -> List[str]:
+    """Greedily pack units into chunks of at most `max_tokens`; oversized units are cut by length."""
+    chunks, current, current_tokens = [], [], 0
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    for unit in units:
+        pieces = [unit[i:i + max_chars] for i in range(0, len(unit), max_chars)] or [unit]
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class ChunkedSummarizer:
+    def __init__(self, complete: CompleteFn, chunk_tokens: int = 6000, fan_in: int = 8, concurrency: int = 4):
+        self.complete = complete
+        self.chunk_tokens = chunk_tokens
+        self.fan_in = max(2, fan_in)
+        self.concurrency = max(1, concurrency)
+
+    async def prepare(self, conversation, system_prompt: str, reduce_prompt: str, model: str) -> Dict:
+        """Run every stage except the final LLM call.
+
+        Returns the `system`/`content` pair for the final call together with chunk
+        counts and the timings so far, so callers can either await or stream it.
+        """
+        timings = {}
+        started = time.perf_counter()
+        units = conversation_units(conversation)
+        chunks = split_into_chunks(units, self.chunk_tokens) or [""]
+        timings["split"] = time.perf_counter() - started
+        plan = {"chunks": len(chunks), "levels": 0, "timings": timings, "started": started}
+        if len(chunks) == 1:
+            plan.update(system=system_prompt, content=chunks[0], final_stage="summarize")
+            return plan
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(system, content):
+            async with semaphore:
+                return await self.complete(system, content, model)
+
+        stage_started = time.perf_counter()
+        partials = await asyncio.gather(*(
+            bounded(system_prompt, f"Part {i + 1} of {len(chunks)} of the conversation:\n{chunk}")
+            for i, chunk in enumerate(chunks)
+        ))
+        timings["map"] = time.perf_counter() - stage_started
+
+        # Reduce in groups until the remaining partials fit in one final call
+        while len(partials) > self.fan_in:
+            plan["levels"] += 1
+            stage_started = time.perf_counter()
+            groups = [partials[i:i + self.fan_in] for i in range(0, len(partials), self.fan_in)]
+            partials = await asyncio.gather(*(
+                bounded(reduce_prompt, _join_partials(group)) if len(group) > 1 else asyncio.sleep(0, result=group[0])
+                for group in groups
+            ))
+            timings[f"reduce_{plan['levels']}"] = time.perf_counter() - stage_started
+
+        plan["levels"] += 1
+        plan.update(system=reduce_prompt, content=_join_partials(partials), final_stage=f"reduce_{plan['levels']}")
+        return plan
+
+    async def summarize(self, conversation, system_prompt: str, reduce_prompt: str, model: str) -> Dict:
+        """Summarize `conversation`; returns the summary plus chunk counts and per-stage timings (seconds)."""
+        plan = await self.prepare(conversation, system_prompt, reduce_prompt, model)
+        stage_started = time.perf_counter()
+        summary = await self.complete(plan["system"], plan["content"], model)
+        return finish_plan(plan, summary, stage_started)
+
+
+def finish_plan(plan: Dict, summary: str, stage_started: float) -> Dict:
+    """Record the final stage of a prepared plan and return the summary result."""
+    timings = plan["timings"]
+    timings[plan["final_stage"]] = time.perf_counter() - stage_started
+    timings["total"] = time.perf_counter() - plan["started"]
+    return {"summary": summary, "chunks": plan["chunks"], "levels": plan["levels"], "timings": timings}
+
+
+def _join_partials(partials: List[str]) -> str:
+    return "\n\n".join(f"Partial summary {i + 1}:\n{partial}" for i, partial in enumerate(partials))
@@ -0,0 +1,199 @@
+"""
+Content-addressed cache for conversation summaries.
+
+Entries are keyed on a digest of the normalized conversation, the model name and
+the system prompt, so re-summarizing an unchanged channel window is a lookup
+instead of an LLM call. A bounded in-memory LRU sits in front of a directory of
+JSON files that survives restarts; both honour the same TTL. The directory is
+pruned at startup and again after every few writes: expired entries go first,
+then the oldest ones until at most `max_disk_entries` remain.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from services.message_batch import MessageBatch
+
+# Temp files older than this belong to writes that never finished
+STALE_TEMP_SECONDS = 3600
+
+
+def normalize_conversation(conversation) -> str:
+    """Render a conversation (string, MessageBatch or list of messages) in a canonical form."""
+    if isinstance(conversation, str):
+        lines = conversation.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        return "\n".join(line.rstrip() for line in lines).strip()
+    if isinstance(conversation, MessageBatch):
+        # The summary depends only on what the prompt shows
+        return conversation.to_prompt()
+    return "\n".join(
+        item if isinstance(item, str) else json.dumps(item, sort_keys=True, ensure_ascii=False)
+        for item in conversation
+    )
+
+
+def summary_cache_key(conversation, model: str, system_prompt: str) -> str:
+    digest = hashlib.sha256()
+    for part in (model, system_prompt.strip(), normalize_conversation(conversation)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 256, ttl: float = 7 * 24 * 3600,
+                 max_disk_entries: Optional[int] = None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_entries if max_disk_entries is None else max_disk_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        # Writes between prunes; the directory holds at most about 10% more than the cap
+        self._prune_every = max(1, self.max_disk_entries // 10)
+        self._writes_since_prune = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.prune()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry["created_at"]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry["summary"]
+                del self._entries[key]
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry["summary"]
+
+    def set(self, key: str, summary: str, **metadata):
+        entry = {"summary": summary, "created_at": time.time(), **metadata}
+        with self._lock:
+            self._remember(key, entry)
+            self._writes_since_prune += 1
+            prune = self._writes_since_prune >= self._prune_every
+            if prune:
+                self._writes_since_prune = 0
+        if self.directory:
+            try:
+                # Unique per writer, so concurrent sets of one key never share a temp file
+                with tempfile.NamedTemporaryFile("w", dir=self.directory, prefix=key + ".", suffix=".tmp",
+                                                 delete=False) as f:
+                    json.dump(entry, f)
+                os.replace(f.name, self._path(key))
+            except OSError as e:
+                print(f"[DEBUG] Could not write summary cache entry {key}: {e}")
+            if prune:
+                self.prune()
+
+    def _remember(self, key: str, entry: dict):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(entry.get("created_at", 0)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def prune(self) -> int:
+        """Delete expired entries, then the oldest ones over `max_disk_entries`; returns how many were removed.
+
+        Temp files left behind by interrupted writes are removed as well.
+        """
+        if not self.directory:
+            return 0
+        if not self._prune_lock.acquire(blocking=False):
+            # Another thread is already pruning
+            return 0
+        try:
+            return self._prune()
+        finally:
+            self._prune_lock.release()
+
+    def _prune(self) -> int:
+        now = time.time()
+        cutoff = now - self.ttl if self.ttl is not None else None
+        entries = []
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.path.getmtime(path)
+                if name.endswith(".tmp"):
+                    if now - mtime > STALE_TEMP_SECONDS:
+                        os.remove(path)
+                    continue
+                if not name.endswith(".json"):
+                    continue
+                if cutoff is not None and mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+                else:
+                    entries.append((mtime, path))
+            except OSError:
+                continue
+        overflow = len(entries) - self.max_disk_entries
+        if overflow > 0:
+            entries.sort()
+            for _, path in entries[:overflow]:
+                try:
+                    os.remove(path)
+                    removed += 1
+                    self.disk_evictions += 1
+                except OSError:
+                    continue
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "entries": len(self._entries),
+            }
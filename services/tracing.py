@@ -0,0 +1,227 @@
+"""
+Lightweight request tracing.
+
+A trace is a tree of timed spans. `trace()` opens the root span for a request
+and `span()` nests a child under whatever span is current. The current span is
+kept in a ContextVar, so it follows the request across awaits, `asyncio.gather`
+tasks and `background_loop` calls. Outside a trace `span()` records nothing.
+
+Finished traces are exported according to TRACE_EXPORT (comma separated):
+    json  append one JSON object per trace to TRACE_JSON_PATH (default data/traces.jsonl)
+    otel  re-emit the spans through the OpenTelemetry API; the process has to
+          configure an SDK tracer provider and exporter for them to go anywhere
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+TRACE_EXPORT = {name.strip() for name in os.environ.get("TRACE_EXPORT", "").split(",") if name.strip()}
+TRACE_JSON_PATH = os.environ.get("TRACE_JSON_PATH", os.path.join("data", "traces.jsonl"))
+# Return span timings in API responses even when Flask is not in debug mode
+TRACE_DEBUG = os.environ.get("TRACE_DEBUG", "0") == "1"
+
+_current = contextvars.ContextVar("nosyworker_span", default=None)
+_write_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "attributes", "children", "start_ns", "_started",
+                 "duration", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.error = None
+        if parent is not None:
+            # list.append is atomic, so children may finish on other threads
+            parent.children.append(self)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+
+    @property
+    def elapsed(self) -> float:
+        return self.duration if self.duration is not None else time.perf_counter() - self._started
+
+    def to_dict(self, origin_ns: Optional[int] = None) -> Dict:
+        """The span tree with start offsets relative to `origin_ns` (this span's start by default)."""
+        origin_ns = self.start_ns if origin_ns is None else origin_ns
+        item = {
+            "name": self.name,
+            "start_ms": round((self.start_ns - origin_ns) / 1e6, 2),
+            "ms": round(self.elapsed * 1000, 2),
+        }
+        if self.attributes:
+            item["attributes"] = self.attributes
+        if self.error:
+            item["error"] = self.error
+        if self.children:
+            item["children"] = [child.to_dict(origin_ns) for child in self.children]
+        return item
+
+
+class _NoSpan:
+    """Stands in for a span when no trace is active."""
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def _reset(token):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # A generator holding the span was closed from another context
+        pass
+
+
+def start_trace(name: str, **attributes) -> Span:
+    """Create a root span without making it current; see `activate()` and `finish_trace()`."""
+    return Span(name, None, attributes)
+
+
+def finish_trace(root: Span):
+    root.end()
+    export(root)
+
+
+@contextmanager
+def activate(span: Span):
+    """Make `span` the parent of spans opened inside the block."""
+    token = _current.set(span)
+    try:
+        yield span
+    finally:
+        _reset(token)
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    """Open the root span of a new trace; it is ended and exported when the block exits."""
+    root = start_trace(name, **attributes)
+    try:
+        with activate(root):
+            yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        finish_trace(root)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the block as a child of the current span (a no-op outside a trace)."""
+    parent = _current.get()
+    if parent is None:
+        yield NO_SPAN
+        return
+    child = Span(name, parent, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _reset(token)
+        child.end()
+
+
+def stage_totals(root: Span) -> Dict[str, float]:
+    """Total seconds per span name below `root`; concurrent spans are summed."""
+    totals = {}
+    pending = list(root.children)
+    while pending:
+        item = pending.pop()
+        totals[item.name] = totals.get(item.name, 0.0) + item.elapsed
+        pending.extend(item.children)
+    return totals
+
+
+def timings(root: Span) -> Dict:
+    """Compact per-request profile: wall time, summed time per stage and the span tree."""
+    return {
+        "total_ms": round(root.elapsed * 1000, 2),
+        "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in sorted(stage_totals(root).items())},
+        "spans": root.to_dict(),
+    }
+
+
+def export(root: Span):
+    stages = ", ".join(f"{child.name} {child.elapsed:.2f}s" for child in root.children)
+    print(f"[DEBUG] Trace {root.name} {root.trace_id[:8]} took {root.elapsed:.2f}s ({stages})")
+    if "json" in TRACE_EXPORT:
+        try:
+            _export_json(root)
+        except OSError as e:
+            print(f"[DEBUG] Could not write trace to {TRACE_JSON_PATH}: {e}")
+    if "otel" in TRACE_EXPORT:
+        try:
+            _export_otel(root)
+        except Exception as e:
+            print(f"[DEBUG] OpenTelemetry export failed: {e}")
+
+
+def _export_json(root: Span):
+    record = {
+        "trace_id": root.trace_id,
+        "name": root.name,
+        "started_at": datetime.fromtimestamp(root.start_ns / 1e9).isoformat(),
+        "duration_ms": round(root.elapsed * 1000, 2),
+        "spans": root.to_dict(),
+    }
+    line = json.dumps(record, default=str) + "\n"
+    directory = os.path.dirname(TRACE_JSON_PATH)
+    with _write_lock:
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(TRACE_JSON_PATH, "a") as f:
+            f.write(line)
+
+
+def _export_otel(root: Span):
+    try:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.trace import Status, StatusCode
+    except ImportError:
+        print("[DEBUG] TRACE_EXPORT=otel needs the opentelemetry-api package")
+        return
+    tracer = otel_trace.get_tracer("nosyworker")
+
+    def emit(item: Span, context):
+        attributes = {key: value for key, value in item.attributes.items() if isinstance(value, (str, bool, int, float))}
+        otel_span = tracer.start_span(item.name, context=context, start_time=item.start_ns, attributes=attributes)
+        if item.error:
+            otel_span.set_status(Status(StatusCode.ERROR, item.error))
+        child_context = otel_trace.set_span_in_context(otel_span)
+        for child in item.children:
+            emit(child, child_context)
+        otel_span.end(end_time=item.start_ns + int(item.elapsed * 1e9))
+
+    emit(root, None)
@@ -0,0 +1,135 @@
+"""
+Cached Slack user directory for resolving message senders.
+
+The whole directory is loaded with one `get_user_directory` MCP call (a paged
+users.list on the server) and persisted to a JSON file, so a restart starts with
+names already known. Once it is older than `ttl` it is refreshed in the
+background while the old copy keeps serving; an unknown user ID triggers a
+refresh at most once every `miss_refresh_interval` seconds. An ID that a
+refresh did not find (e.g. a user from another workspace) does not trigger
+another one. Resolving a sender is a dict lookup.
+"""
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from services.background_loop import background_loop
+
+MENTION_RE = re.compile(r"<@([UW][A-Z0-9]+)(?:\|[^>]*)?>")
+
+
+class UserDirectory:
+    def __init__(self, path: str, fetch: Callable[[], Awaitable[Dict[str, dict]]], ttl: float = 24 * 3600,
+                 miss_refresh_interval: float = 300.0):
+        self.path = path
+        self.fetch = fetch
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self.users = {}
+        self._names_by_id = {}
+        self.fetched_at = 0.0
+        self.last_attempt = 0.0
+        self.refreshes = 0
+        self._refresh_task = None
+        # Unknown IDs waiting for a refresh, and those a refresh did not find
+        self._pending_missing = set()
+        self._not_found = set()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self._set_users(data["users"], data["fetched_at"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[DEBUG] Could not load user directory {self.path}: {e}")
+
+    def _set_users(self, users: Dict[str, dict], fetched_at: float):
+        # Swapped in whole, so readers on other threads never see a half-built map
+        self._names_by_id = {user_id: user["name"] for user_id, user in users.items() if user.get("name")}
+        self.users, self.fetched_at = users, fetched_at
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Unique per writer, so concurrent saves never share a temp file
+        with tempfile.NamedTemporaryFile("w", dir=directory or ".", prefix=os.path.basename(self.path) + ".",
+                                         suffix=".tmp", delete=False) as f:
+            json.dump({"users": self.users, "fetched_at": self.fetched_at}, f)
+        os.replace(f.name, self.path)
+
+    async def names(self) -> Dict[str, str]:
+        """Return {user_id: display name}, loading the directory first if it is empty."""
+        return await background_loop.call(self._names())
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+
+    async def _names(self) -> Dict[str, str]:
+        if not self.users:
+            # After a failed load, retry at most every miss_refresh_interval
+            if self.refreshing or time.time() - self.last_attempt > self.miss_refresh_interval:
+                await self._refresh_once()
+        elif time.time() - self.fetched_at > self.ttl:
+            self._refresh_in_background()
+        return self._names_by_id
+
+    def report_missing(self, user_ids):
+        """Refresh early (rate limited) when messages mention users the directory does not know.
+
+        IDs a previous refresh already failed to find are ignored.
+        """
+        if user_ids:
+            background_loop.loop.call_soon_threadsafe(self._report_missing, set(user_ids))
+
+    def _report_missing(self, user_ids):
+        new = user_ids - self._not_found
+        if not new:
+            return
+        self._pending_missing |= new
+        if time.time() - self.last_attempt > self.miss_refresh_interval:
+            print(f"[DEBUG] {len(new)} unknown Slack user(s), refreshing the user directory")
+            self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def _refresh_once(self):
+        # Callers arriving during a refresh wait for it instead of starting another
+        self._refresh_in_background()
+        await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self):
+        self.last_attempt = time.time()
+        try:
+            users = await self.fetch()
+        except Exception as e:
+            print(f"[DEBUG] User directory refresh failed: {e}")
+            return
+        self._set_users(users, time.time())
+        self._not_found |= {user_id for user_id in self._pending_missing if user_id not in users}
+        self._pending_missing = set()
+        self.refreshes += 1
+        # Runs on the shared loop; write the file from a worker thread
+        await asyncio.to_thread(self._save)
+        print(f"[DEBUG] User directory refreshed: {len(users)} users")
+
+    def resolve_mentions(self, text: str, names: Dict[str, str]) -> str:
+        """Replace <@U123> mentions with @name."""
+        return MENTION_RE.sub(lambda m: f"@{names[m.group(1)]}" if m.group(1) in names else m.group(0), text)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self.users),
+            "age_seconds": time.time() - self.fetched_at if self.fetched_at else None,
+            "refreshes": self.refreshes,
+        }